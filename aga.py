@@ -0,0 +1,125 @@
+"""Run, view or benchmark a scenario from the command line.
+
+    python aga.py list
+    python aga.py run prototype05 [--until 5] [--seed 0] [--set collision_mode=batch]
+                      [--checkpoint run.ckpt.npz --checkpoint-every 60]
+    python aga.py view scenarios/prototype01.toml [--speed 2]
+    python aga.py bench prototype05 [--sizes 500 5000] [--min-time 1.0]
+
+A scenario is a name from ``scenarios/`` or the path of a TOML/JSON file
+(see ``scenario.py``); ``--set NAME=VALUE`` overrides a ``Simulation``
+argument, with VALUE parsed as JSON when it can be. Every module is
+imported by the command that needs it, so ``run`` never imports
+matplotlib, and ``--backend numpy`` also keeps numba out of short batch
+jobs.
+"""
+import argparse
+import json
+import os
+import time
+
+from scenario import load_scenario, scenario_names, simulation_kwargs
+
+
+def _parse_override(text):
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def _kwargs(args):
+    kwargs = simulation_kwargs(load_scenario(args.scenario))
+    kwargs.update(args.set)
+    if args.backend is not None:
+        kwargs['backend'] = args.backend
+    return kwargs
+
+
+def _build(args):
+    from simulation import Simulation
+    return Simulation(**_kwargs(args), seed=args.seed)
+
+
+def list_scenarios(args):
+    for name in scenario_names():
+        print(f"{name:<20}{load_scenario(name).get('description', '')}")
+
+
+def run(args):
+    start = time.perf_counter()
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        from checkpoint import load_checkpoint
+        sim = load_checkpoint(args.checkpoint)
+    else:
+        sim = _build(args)
+    checkpointer = None
+    if args.checkpoint:
+        from checkpoint import Checkpointer
+        checkpointer = Checkpointer(args.checkpoint, every_seconds=args.checkpoint_every)
+    sim.run(args.until, checkpoint=checkpointer)
+    if checkpointer is not None:
+        checkpointer.save(sim)
+    print(json.dumps({
+        'scenario': args.scenario,
+        'seed': args.seed,
+        'time': sim.time,
+        'steps': sim.steps,
+        'wall_hits': int(sim.wall_hits),
+        'pair_hits': int(sim.pair_hits),
+        'kinetic_energy': float(sim.kinetic_energy()),
+        'g_eff': float(sim.g_eff),
+        'seconds': time.perf_counter() - start,
+    }))
+
+
+def view(args):
+    from viewer import animate
+    animate(_build(args), until=args.until, speed=args.speed, title=args.scenario)
+
+
+def bench(args):
+    from benchmarks import bench as bench_engine
+    kwargs = _kwargs(args)
+    print(f"{'N':>8}{'steps/s':>14}{'ns/p-step':>14}{'peak MiB':>12}{'checks/step':>14}")
+    for n in args.sizes or [kwargs.get('num_particles', 50)]:
+        record = bench_engine(args.scenario, n, args.min_time, args.seed, params=kwargs)
+        print(f"{n:>8}{record['steps_per_sec']:>14.1f}{record['ns_per_particle_step']:>14.1f}"
+              f"{record['peak_memory_bytes'] / 2**20:>12.1f}{record['pair_checks_per_step']:>14.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='scenarios in scenarios/').set_defaults(func=list_scenarios)
+
+    for name, func, help in (('run', run, 'run headless and print a JSON summary'),
+                             ('view', view, 'animate in a matplotlib window'),
+                             ('bench', bench, 'time the steps')):
+        command = commands.add_parser(name, help=help)
+        command.set_defaults(func=func)
+        command.add_argument('scenario', help='scenario name or TOML/JSON file')
+        command.add_argument('--set', action='append', default=[], type=_parse_override,
+                             metavar='NAME=VALUE', help='override a Simulation argument')
+        command.add_argument('--backend', choices=('auto', 'numpy', 'numba'))
+        command.add_argument('--seed', type=int, default=0 if name == 'bench' else None)
+        if name != 'bench':
+            command.add_argument('--until', type=float, help='end time (default simulation_time)')
+    commands.choices['run'].add_argument('--checkpoint', help='checkpoint file, resumed from if it exists')
+    commands.choices['run'].add_argument('--checkpoint-every', type=float, default=60.0,
+                                         help='seconds between checkpoints')
+    commands.choices['view'].add_argument('--speed', type=float, default=1.0)
+    commands.choices['bench'].add_argument('--sizes', type=int, nargs='+',
+                                           help='particle counts (default the scenario\'s)')
+    commands.choices['bench'].add_argument('--min-time', type=float, default=1.0,
+                                           help='seconds measured per run')
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
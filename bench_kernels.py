@@ -0,0 +1,84 @@
+"""Time every kernel on each available backend and report the speedup per N.
+
+    python bench_kernels.py [N ...]
+
+Each kernel runs on identical inputs per backend, the outputs are checked
+for bit-for-bit equality, and the best of several repeats is reported.
+"""
+import sys
+import time
+
+import numpy as np
+
+from collisions import grid_pairs, overlapping_pairs
+from kernels import BACKENDS, get_backend
+
+DEFAULT_SIZES = (50, 500, 5000, 50000)
+
+
+def _best_time(func, make_args, repeats=5):
+    best = np.inf
+    for _ in range(repeats):
+        args = make_args()
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, args, result
+
+
+def kernel_cases(n, seed=0):
+    """Inputs for each kernel at ``n`` particles, as name -> (kernel name, args factory)."""
+    rng = np.random.default_rng(seed)
+    # A chamber at roughly the prototypes' packing density
+    width = height = np.sqrt(n * 10.0)
+    pos = np.column_stack([rng.uniform(-1, width + 1, n), rng.uniform(-1, height + 1, n)])
+    vel = rng.uniform(-5, 5, (n, 2))
+    i_idx, j_idx = grid_pairs(pos, 1.8)
+    i_idx, j_idx = overlapping_pairs(pos, i_idx, j_idx, 1.8)
+    box = np.array([width, height])
+    pos3 = rng.uniform(0, 1, (n, 3))
+    vel3 = rng.uniform(-0.1, 0.1, (n, 3))
+    return {
+        'advance': ('advance', lambda: (pos.copy(), vel.copy(), 980.0, 0.01)),
+        'reflect_walls': ('reflect_walls', lambda: (pos.copy(), vel.copy(), box, 0.9, 0.8, True)),
+        'resolve_sequential': ('resolve_sequential', lambda: (pos.copy(), vel.copy(), i_idx, j_idx, 0.9, 0.2)),
+        'pair_times': ('pair_times', lambda: (pos3[0], vel3[0], pos3, vel3, 0.02)),
+    }
+
+
+def _outputs(args, result):
+    # Everything a kernel may have written to, plus its return value
+    arrays = [a for a in args if isinstance(a, np.ndarray)]
+    return arrays + [np.asarray(result)]
+
+
+def main(sizes=DEFAULT_SIZES):
+    backends = []
+    for name in BACKENDS:
+        try:
+            backends.append(get_backend(name))
+        except ImportError:
+            print(f"backend {name!r} not available, skipped")
+    # Compile the JIT kernels before timing
+    for backend in backends:
+        for kernel, make_args in kernel_cases(50).values():
+            getattr(backend, kernel)(*make_args())
+
+    print(f"{'kernel':<20}{'N':>8}" + ''.join(f"{b.name + ' (us)':>16}" for b in backends) + f"{'speedup':>10}")
+    for n in sizes:
+        for label, (kernel, make_args) in kernel_cases(n).items():
+            timings = []
+            outputs = []
+            for backend in backends:
+                elapsed, args, result = _best_time(getattr(backend, kernel), make_args)
+                timings.append(elapsed)
+                outputs.append(_outputs(args, result))
+            for other in outputs[1:]:
+                if not all(np.array_equal(a, b) for a, b in zip(outputs[0], other)):
+                    raise AssertionError(f"backends disagree on {label} at N={n}")
+            speedup = timings[0] / timings[-1]
+            print(f"{label:<20}{n:>8}" + ''.join(f"{t * 1e6:>16.1f}" for t in timings) + f"{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,197 @@
+"""Benchmark the physics of every prototype headless, across particle counts.
+
+    python benchmarks.py [--sizes 50 500 5000 50000] [--engines prototype05 event_driven]
+                         [--min-time 1.0] [--out bench.json] [--compare old.json]
+    python benchmarks.py --workers 1 2 4 8 [--sizes 10000 100000]
+
+Each prototype runs through ``simulation.Simulation`` with its own preset,
+in a chamber scaled with N so the packing stays that of the original 50
+particles; ``event_driven`` is the Python port of the MATLAB model at a
+fixed 5 % volume fraction, where one step is one event. The suite reports
+steps per second, ns per particle-step, peak traced memory and pair checks
+per step, and writes everything to JSON so runs of different iterations can
+be compared.
+
+``--workers`` measures the scaling of ``parallel.SlabDecomposition``
+instead: prototype05 in batch mode, serial and on each worker count, with
+the speedup over serial.
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import os
+
+import numpy as np
+
+from event_driven import EventDrivenSimulation
+from kernels import get_backend
+from parallel import SlabDecomposition
+from simulation import PRESETS, Simulation
+
+DEFAULT_SIZES = (50, 500, 5000, 50000)
+ENGINES = tuple(PRESETS) + ('event_driven',)
+
+
+def make_engine(engine, n, seed=0, params=None):
+    """Build ``engine`` with ``n`` particles at the packing of its original setup.
+
+    ``params`` (``Simulation`` arguments, e.g. of a scenario file) replace
+    the preset of ``engine``.
+    """
+    if engine == 'event_driven':
+        # Radius 0.01 as in the script, cube sized for a 5 % volume fraction
+        r = 0.01
+        box_size = (n * 4 / 3 * np.pi * r**3 / 0.05) ** (1 / 3)
+        return EventDrivenSimulation(num_particles=n, box_size=max(box_size, 10 * r),
+                                     particle_radius=r, seed=seed)
+    preset = PRESETS[engine] if params is None else params
+    dim = preset.get('dim', 2)
+    scale = (n / preset['num_particles']) ** (1 / dim)
+    width, height = preset.get('tube_width', 50.0), preset.get('tube_height', 25.0)
+    r = preset.get('particle_radius', 0.9)
+    spawn_height = preset.get('spawn_height', (height - r - 5, height - r))
+    overrides = dict(num_particles=n, tube_width=width * scale, tube_height=height * scale,
+                     spawn_height=(spawn_height[0] * scale, spawn_height[1] * scale), seed=seed)
+    if dim == 3:
+        overrides['tube_depth'] = preset['tube_depth'] * scale
+    return Simulation(**{**preset, **overrides})
+
+
+def _collision_count(sim):
+    if isinstance(sim, EventDrivenSimulation):
+        return sim.wall_collisions + sim.particle_collisions
+    return sim.wall_hits + sim.pair_hits
+
+
+def bench(engine, n, min_time=1.0, seed=0, params=None):
+    """Time one engine at ``n`` particles; returns a result record."""
+    start = time.perf_counter()
+    sim = make_engine(engine, n, seed, params)
+    setup_seconds = time.perf_counter() - start
+    # One untimed step so JIT compilation stays out of the measurement
+    sim.step()
+    checks_before = sim.pair_checks
+    collisions_before = _collision_count(sim)
+
+    # Run in doubling batches until at least min_time has been measured
+    steps = 0
+    elapsed = 0.0
+    batch = 1
+    while elapsed < min_time:
+        start = time.perf_counter()
+        sim.step(batch)
+        elapsed += time.perf_counter() - start
+        steps += batch
+        batch *= 2
+    pair_checks = sim.pair_checks - checks_before
+    collisions = _collision_count(sim) - collisions_before
+
+    # Peak memory of a fresh engine over a few steps, traced separately so
+    # tracemalloc's overhead stays out of the timings
+    tracemalloc.start()
+    traced = make_engine(engine, n, seed, params)
+    traced.step(min(steps, 16))
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'engine': engine,
+        'num_particles': n,
+        'steps': steps,
+        'seconds': elapsed,
+        'setup_seconds': setup_seconds,
+        'steps_per_sec': steps / elapsed,
+        'ns_per_particle_step': elapsed / (steps * n) * 1e9,
+        'peak_memory_bytes': peak_memory,
+        'pair_checks_per_step': pair_checks / steps,
+        'collisions_per_step': collisions / steps,
+    }
+
+
+def bench_parallel(n, workers=(1, 2, 4, 8), slabs=32, min_time=1.0, seed=0, report=print):
+    """prototype05 in batch mode at ``n`` particles, serial and on each of ``workers`` threads.
+
+    Returns one ``bench`` record per run, serial first (``workers`` 0), each
+    with its ``speedup`` over serial.
+    """
+    params = {**PRESETS['prototype05'], 'collision_mode': 'batch'}
+    records = []
+    for count in (0,) + tuple(workers):
+        parallel = SlabDecomposition(count, slabs) if count else None
+        record = bench('prototype05', n, min_time, seed, {**params, 'parallel': parallel})
+        if parallel is not None:
+            parallel.shutdown()
+        record.update(workers=count, slabs=slabs if count else None,
+                      speedup=record['steps_per_sec'] / records[0]['steps_per_sec'] if records else 1.0)
+        records.append(record)
+        report(f"{n:>8}{count or 'serial':>8}{record['steps_per_sec']:>14.1f}"
+               f"{record['ns_per_particle_step']:>14.1f}{record['speedup']:>9.2f}x")
+    return records
+
+
+def run_suite(engines=ENGINES, sizes=DEFAULT_SIZES, min_time=1.0, seed=0, report=print):
+    results = []
+    for engine in engines:
+        for n in sizes:
+            record = bench(engine, n, min_time, seed)
+            results.append(record)
+            report(f"{engine:<14}{n:>8}{record['steps_per_sec']:>14.1f}{record['ns_per_particle_step']:>14.1f}"
+                   f"{record['peak_memory_bytes'] / 2**20:>12.1f}{record['pair_checks_per_step']:>14.1f}")
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'backend': get_backend().name,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def compare(current, previous, report=print):
+    """Print the ns/particle-step ratio of ``current`` over ``previous`` for matching runs."""
+    old = {(r['engine'], r['num_particles']): r for r in previous['results']}
+    for record in current['results']:
+        match = old.get((record['engine'], record['num_particles']))
+        if match:
+            ratio = record['ns_per_particle_step'] / match['ns_per_particle_step']
+            flag = '  <-- slower' if ratio > 1.1 else ''
+            report(f"{record['engine']:<14}{record['num_particles']:>8}{ratio:>10.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=ENGINES)
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds measured per run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench.json')
+    parser.add_argument('--compare', help='earlier JSON output to compare against')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        help='measure slab-parallel scaling on these worker counts instead')
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        print(f"{'N':>8}{'workers':>8}{'steps/s':>14}{'ns/p-step':>14}{'speedup':>10}  ({os.cpu_count()} CPUs)")
+        records = [record for n in args.sizes for record in bench_parallel(n, args.workers, min_time=args.min_time,
+                                                                           seed=args.seed)]
+        with open(args.out, 'w') as f:
+            json.dump({'python': platform.python_version(), 'numpy': np.__version__,
+                       'backend': get_backend().name, 'machine': platform.machine(),
+                       'cpus': os.cpu_count(), 'results': records}, f, indent=2)
+        print(f"results written to {args.out}")
+        return
+
+    print(f"{'engine':<14}{'N':>8}{'steps/s':>14}{'ns/p-step':>14}{'peak MiB':>12}{'checks/step':>14}")
+    suite = run_suite(args.engines, args.sizes, args.min_time, args.seed)
+    with open(args.out, 'w') as f:
+        json.dump(suite, f, indent=2)
+    print(f"results written to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(suite, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
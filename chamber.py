@@ -0,0 +1,138 @@
+"""Chamber dynamics of the 'chamber' and 'drag' gravity models, integrated once and cached.
+
+Once free fall starts, the chamber's velocity and the effective gravity
+inside it depend only on the time since the switch and on a handful of
+parameters, never on the particles. ``chamber_model()`` returns the shared
+``ChamberModel`` for a parameter tuple from an LRU cache, so every
+``Simulation``, ``Ensemble`` chamber and sweep run with the same parameters
+reads one table instead of integrating the same curve again.
+"""
+import functools
+
+import numpy as np
+
+CHAMBER_MODELS = ('chamber', 'drag')
+
+
+def integrate(gravity_model, gravity, dt, drag_factor, mass_aga, velocity, num_steps):
+    """Step the free-falling chamber ``num_steps`` times from ``velocity``.
+
+    Returns the per-step particle acceleration, effective gravity and
+    chamber velocity at the end of each step, each of shape
+    ``(num_steps,) + shape(velocity)``. The parameters are scalars or
+    arrays with one entry per chamber; every chamber goes through the same
+    elementwise operations, so integrating many at once gives the same
+    bits as integrating each alone.
+    """
+    shape = (num_steps,) + np.shape(velocity)
+    accel = np.empty(shape)
+    g_eff = np.empty(shape)
+    velocities = np.empty(shape)
+    v = velocity
+    for k in range(num_steps):
+        drag_force = drag_factor * (v * v)
+        if gravity_model == 'chamber':
+            # Particles feel full gravity, the chamber falls freely
+            g_eff[k] = np.maximum(gravity - drag_force / mass_aga, 0)
+            accel[k] = gravity
+            v = v + gravity * dt
+        else:
+            # 'drag': particles feel the drag deceleration of the chamber
+            g_eff[k] = drag_force / mass_aga
+            accel[k] = g_eff[k]
+            v = v + (gravity - drag_force / mass_aga) * dt
+        velocities[k] = v
+    return accel, g_eff, velocities
+
+
+class ChamberModel:
+    """Free-fall phase of the chamber, tabulated per time step ``dt``.
+
+    Row ``k`` describes the ``k``-th step after free fall starts: ``accel``
+    is the downward acceleration applied to the particles during it,
+    ``g_eff`` the effective gravity reported for it and ``velocity`` the
+    chamber velocity at its start (``velocity[k + 1]`` at its end).
+    Fixed-step runs read the rows by index; ``at`` interpolates the table at
+    arbitrary times, vectorized over an array of times. The table grows on
+    demand.
+    """
+
+    def __init__(self, gravity_model, gravity, dt, drag_coefficient, air_density, mass_aga,
+                 frontal_area):
+        if gravity_model not in CHAMBER_MODELS:
+            raise ValueError(f"unknown gravity_model {gravity_model!r}, expected one of {CHAMBER_MODELS}")
+        self.gravity_model = gravity_model
+        self.gravity = gravity
+        self.dt = dt
+        # Drag force = drag_factor * velocity²
+        self.drag_factor = 0.5 * air_density * drag_coefficient * frontal_area
+        self.mass_aga = mass_aga
+        self.accel = np.empty(0)
+        self.g_eff = np.empty(0)
+        self.velocity = np.zeros(1)
+
+    def __len__(self):
+        return len(self.accel)
+
+    def extend(self, num_steps):
+        """Make sure the table holds at least ``num_steps`` rows (it at least doubles)."""
+        extend_models([self], num_steps)
+
+    def _append(self, accel, g_eff, velocity):
+        self.accel = np.concatenate([self.accel, accel])
+        self.g_eff = np.concatenate([self.g_eff, g_eff])
+        self.velocity = np.concatenate([self.velocity, velocity])
+
+    def row(self, k):
+        """``(accel, g_eff, velocity at the end)`` of free-fall step ``k``."""
+        if k >= len(self.accel):
+            self.extend(k + 1)
+        return self.accel.item(k), self.g_eff.item(k), self.velocity.item(k + 1)
+
+    def rows(self, k):
+        """Vectorized ``row``: arrays of accel, g_eff and end velocity for the steps ``k``."""
+        k = np.asarray(k)
+        self.extend(int(k.max(initial=0)) + 1)
+        return self.accel[k], self.g_eff[k], self.velocity[k + 1]
+
+    def at(self, t):
+        """``(accel, g_eff, velocity)`` at times ``t`` since free fall started, linearly interpolated."""
+        t = np.asarray(t, dtype=float)
+        self.extend(int(np.ceil(t.max(initial=0.0) / self.dt)) + 2)
+        grid = np.arange(len(self)) * self.dt
+        return (np.interp(t, grid, self.accel), np.interp(t, grid, self.g_eff),
+                np.interp(t, grid, self.velocity[:-1]))
+
+
+def extend_models(models, num_steps):
+    """Grow every table in ``models`` to at least ``num_steps`` rows, integrating them together.
+
+    The models must share ``gravity_model`` and ``dt``; short tables at
+    least double, as in ``ChamberModel.extend``.
+    """
+    short = [model for model in models if len(model) < num_steps]
+    if not short:
+        return
+    first = short[0]
+    count = max(max(num_steps, 2 * len(model), 64) - len(model) for model in short)
+    if len(short) == 1:
+        # Plain floats: much faster than one-element arrays for a single curve
+        accel, g_eff, velocity = integrate(first.gravity_model, first.gravity, first.dt,
+                                           first.drag_factor, first.mass_aga,
+                                           first.velocity.item(-1), count)
+        first._append(accel, g_eff, velocity)
+        return
+    accel, g_eff, velocity = integrate(
+        first.gravity_model, np.array([model.gravity for model in short]), first.dt,
+        np.array([model.drag_factor for model in short]),
+        np.array([model.mass_aga for model in short]),
+        np.array([model.velocity[-1] for model in short]), count)
+    for c, model in enumerate(short):
+        model._append(accel[:, c], g_eff[:, c], velocity[:, c])
+
+
+@functools.lru_cache(maxsize=256)
+def chamber_model(gravity_model, gravity, dt, drag_coefficient, air_density, mass_aga, frontal_area):
+    """The shared ``ChamberModel`` for one parameter tuple (all arguments must be hashable)."""
+    return ChamberModel(gravity_model, gravity, dt, drag_coefficient, air_density, mass_aga,
+                        frontal_area)
@@ -0,0 +1,85 @@
+"""Atomic, compressed checkpoints of a running simulation, and restarts from them.
+
+A checkpoint is one ``.npz`` file: the engine's ``state_dict()`` arrays
+(particles, counters, the event calendar of an ``EventDrivenSimulation``)
+plus a JSON entry with its scalars and RNG state. It is written to a
+temporary file next to the target, flushed to disk and renamed over the
+previous checkpoint, so a crash leaves either the old or the new one,
+never a torn file. A run restored with ``load_checkpoint`` continues
+bit-identically to one that was never interrupted::
+
+    sim = Simulation.from_preset('protoypr03', seed=0)
+    sim.run(checkpoint=Checkpointer('run.ckpt.npz', every_seconds=60))
+
+    # after a crash
+    sim = load_checkpoint('run.ckpt.npz')
+    sim.run(checkpoint=Checkpointer('run.ckpt.npz', every_seconds=60))
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from event_driven import EventDrivenSimulation
+from simulation import Simulation
+
+ENGINES = {cls.__name__: cls for cls in (Simulation, EventDrivenSimulation)}
+
+
+def save_checkpoint(sim, path):
+    """Atomically write the state of ``sim`` to ``path``."""
+    state = sim.state_dict()
+    arrays = {name: value for name, value in state.items() if isinstance(value, np.ndarray)}
+    meta = {name: value for name, value in state.items() if name not in arrays}
+    meta['engine'] = type(sim).__name__
+
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """The simulation saved in ``path``, ready to continue."""
+    with np.load(path) as data:
+        state = json.loads(str(data['meta']))
+        state.update({name: data[name] for name in data.files if name != 'meta'})
+    engine = state.pop('engine')
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r} in {path}, expected one of {sorted(ENGINES)}")
+    return ENGINES[engine].from_state_dict(state)
+
+
+class Checkpointer:
+    """Save a run to ``path`` every ``every_steps`` steps and/or ``every_seconds`` of wall clock.
+
+    Pass it as ``run(checkpoint=...)``; for an ``EventDrivenSimulation`` a
+    step is one event. ``saves`` counts the checkpoints written.
+    """
+
+    def __init__(self, path, every_steps=None, every_seconds=None):
+        if every_steps is None and every_seconds is None:
+            raise ValueError("give every_steps, every_seconds or both")
+        self.path = path
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+        self.saves = 0
+        self._steps = 0
+        self._last_save = time.monotonic()
+
+    def after_step(self, sim):
+        self._steps += 1
+        due = self.every_steps is not None and self._steps >= self.every_steps
+        if self.every_seconds is not None and time.monotonic() - self._last_save >= self.every_seconds:
+            due = True
+        if due:
+            self.save(sim)
+
+    def save(self, sim):
+        save_checkpoint(sim, self.path)
+        self.saves += 1
+        self._steps = 0
+        self._last_save = time.monotonic()
@@ -0,0 +1,214 @@
+import warnings
+
+import numpy as np
+
+from chamber import CHAMBER_MODELS, chamber_model, extend_models
+from collisions import grid_pairs, overlapping_pairs, resolve_batch
+from placement import place_particles
+from simulation import GRAVITY_MODELS, PRESETS
+
+# Parameters that may differ from chamber to chamber
+PER_CHAMBER = ('wall_restitution', 'particle_restitution', 'gravity', 'start_time',
+               'drag_coefficient', 'air_density', 'mass_aga', 'frontal_area')
+
+
+class Ensemble:
+    """Many independent chambers advanced together in ``(num_chambers, num_particles)`` arrays.
+
+    Every chamber follows the same rules as ``simulation.Simulation`` (gravity
+    schedule, wall reflections and, with ``particle_restitution``, batch
+    particle collisions), but one vectorized step advances all of them, so
+    the Python overhead is paid once per step instead of once per chamber.
+    The parameters in ``PER_CHAMBER`` accept either a scalar or one value per
+    chamber. With a single chamber and the same seed the result matches a
+    batch-mode ``Simulation``.
+    """
+
+    def __init__(self, num_chambers, num_particles=50, tube_width=50.0, tube_height=25.0,
+                 particle_radius=0.9, gravity=980.0, start_time=1.0, simulation_time=10.0,
+                 dt=0.01, wall_restitution=0.8, particle_restitution=None, particle_mass=100.0,
+                 gravity_model='switch_off', top_wall=True, drag_coefficient=0.5,
+                 air_density=0.0012, mass_aga=500.0, frontal_area=50.0, spawn_height=None,
+                 initial_speed=5.0, overlap_free=None, seed=None):
+        if gravity_model not in GRAVITY_MODELS:
+            raise ValueError(f"unknown gravity_model {gravity_model!r}, expected one of {GRAVITY_MODELS}")
+        self.num_chambers = num_chambers
+        self.num_particles = num_particles
+        self.tube_width = tube_width
+        self.tube_height = tube_height
+        self.particle_radius = particle_radius
+        self.particle_mass = particle_mass
+        self.gravity_model = gravity_model
+        self.top_wall = top_wall
+        self.simulation_time = simulation_time
+        self.dt = dt
+
+        # Per-chamber parameters as (num_chambers,) arrays
+        def per_chamber(value):
+            return np.broadcast_to(np.asarray(value, dtype=float), (num_chambers,)).copy()
+        self.wall_restitution = per_chamber(wall_restitution)
+        self.particle_restitution = None if particle_restitution is None else per_chamber(particle_restitution)
+        self.gravity = per_chamber(gravity)
+        self.start_time = per_chamber(start_time)
+        self.drag_coefficient = per_chamber(drag_coefficient)
+        self.air_density = per_chamber(air_density)
+        self.mass_aga = per_chamber(mass_aga)
+        self.frontal_area = per_chamber(frontal_area)
+
+        # Initialize particle positions and velocities
+        self.rng = np.random.default_rng(seed)
+        if spawn_height is None:
+            spawn_height = (tube_height - particle_radius - 5, tube_height - particle_radius)
+        shape = (num_chambers, num_particles)
+        self.pos = np.empty(shape + (2,))
+        self.vel = np.empty(shape + (2,))
+        required = overlap_free is not None
+        if overlap_free is None:
+            overlap_free = particle_restitution is not None
+        if overlap_free:
+            state = self.rng.bit_generator.state
+            try:
+                # One chamber at a time, so a single chamber matches Simulation
+                for c in range(num_chambers):
+                    self.pos[c] = place_particles(num_particles, (particle_radius, spawn_height[0]),
+                                                  (tube_width - particle_radius, spawn_height[1]),
+                                                  particle_radius, self.rng)
+            except ValueError as error:
+                if required:
+                    raise
+                warnings.warn(f"{error}; drawing positions uniformly, particles may overlap")
+                self.rng.bit_generator.state = state
+                overlap_free = False
+        if not overlap_free:
+            self.pos[..., 0] = self.rng.uniform(particle_radius, tube_width - particle_radius, shape)
+            self.pos[..., 1] = self.rng.uniform(spawn_height[0], spawn_height[1], shape)
+        self.vel[..., 0] = self.rng.uniform(-initial_speed, initial_speed, shape)
+        self.vel[..., 1] = self.rng.uniform(-initial_speed, initial_speed, shape)
+
+        # Simulation state
+        self.time = 0.0
+        self.steps = 0
+        self.is_free_fall = np.zeros(num_chambers, dtype=bool)
+        self.velocity_chamber = np.zeros(num_chambers)
+        self.g_eff = np.zeros(num_chambers) if gravity_model in ('anti_gravity', 'chamber') else self.gravity.copy()
+        self.wall_hits = np.zeros(num_chambers, dtype=np.int64)
+        self.free_fall_steps = np.zeros(num_chambers, dtype=np.int64)
+
+        # Chambers with the same parameters share one cached free-fall curve;
+        # the curves are stacked into (unique models, steps) tables
+        if gravity_model in CHAMBER_MODELS:
+            params = np.stack([self.gravity, self.drag_coefficient, self.air_density,
+                               self.mass_aga, self.frontal_area], axis=1)
+            unique, self._model_index = np.unique(params, axis=0, return_inverse=True)
+            self.chambers = [chamber_model(gravity_model, g, dt, c, a, m, f)
+                             for g, c, a, m, f in unique.tolist()]
+            self._model_index = self._model_index.ravel()
+            self._tables = None
+
+    @classmethod
+    def from_preset(cls, name, num_chambers, **overrides):
+        """An ensemble of ``num_chambers`` copies of a prototype (see ``simulation.PRESETS``)."""
+        if name not in PRESETS:
+            raise KeyError(f"unknown preset {name!r}, expected one of {sorted(PRESETS)}")
+        params = {**PRESETS[name], **overrides}
+        dim = params.pop('dim', 2)
+        if dim != 2:
+            raise ValueError(f"preset {name!r} is {dim}-D, ensembles only support 2-D chambers")
+        params.pop('tube_depth', None)
+        params.pop('collision_mode', None)
+        return cls(num_chambers, **params)
+
+    def _gravity_step(self):
+        # Vectorized version of Simulation._gravity_step over all chambers
+        ff = self.is_free_fall
+        g = self.gravity
+        if self.gravity_model == 'switch_off':
+            self.g_eff = np.where(ff, 0.0, g)
+            return self.g_eff
+        if self.gravity_model == 'anti_gravity':
+            self.g_eff = np.where(ff, -g, 0.0)
+            return self.g_eff
+        # 'chamber' and 'drag' read each chamber's row of its cached curve
+        accel, g_eff, velocity = self._chamber_rows(self.free_fall_steps)
+        self.free_fall_steps += ff
+        if self.gravity_model == 'chamber':
+            self.g_eff = np.where(ff, g_eff, np.maximum(g, 0))
+            self.velocity_chamber = np.where(ff, velocity, self.velocity_chamber)
+            return np.where(ff, accel, 0.0)
+        # 'drag'
+        self.g_eff = np.where(ff, g_eff, g)
+        self.velocity_chamber = np.where(ff, velocity, 0.0)
+        return self.g_eff
+
+    def _chamber_rows(self, k):
+        # Gather row k[c] of chamber c's curve. The tables are stored
+        # (steps, unique models), so chambers at the same step read one
+        # contiguous row. They first cover the free fall up to
+        # simulation_time and are rebuilt, at least doubling, if a chamber
+        # runs past their end
+        if self._tables is None or k.max() >= len(self._tables[0]):
+            if self._tables is None:
+                size = int(np.ceil((self.simulation_time - self.start_time.min()) / self.dt)) + 2
+            else:
+                size = 2 * len(self._tables[0])
+            size = max(size, int(k.max()) + 1)
+            extend_models(self.chambers, size)
+            self._tables = (np.stack([model.accel[:size] for model in self.chambers], axis=1),
+                            np.stack([model.g_eff[:size] for model in self.chambers], axis=1),
+                            np.stack([model.velocity[1:size + 1] for model in self.chambers], axis=1))
+        accel, g_eff, velocity = self._tables
+        models = self._model_index
+        return accel[k, models], g_eff[k, models], velocity[k, models]
+
+    def _handle_walls(self):
+        r = self.particle_radius
+        e = self.wall_restitution[:, None]
+        # Lower and upper bounds per axis; the top wall is optional
+        upper = [self.tube_width - r, self.tube_height - r if self.top_wall else np.inf]
+        for axis in (0, 1):
+            p = self.pos[..., axis]
+            v = self.vel[..., axis]
+            low = p < r
+            high = p > upper[axis]
+            hit = low | high
+            v[hit] *= np.broadcast_to(-e, hit.shape)[hit]
+            p[low] = r
+            p[high] = upper[axis]
+            self.wall_hits += hit.sum(axis=1)
+
+    def _handle_particle_collisions(self):
+        # Lay the chambers side by side with a gap wider than one cell so a
+        # single grid broad phase serves all of them without cross-talk
+        contact_distance = 2 * self.particle_radius
+        offset = (self.tube_width + 2 * contact_distance) * np.arange(self.num_chambers)
+        pos = self.pos.copy()
+        pos[..., 0] += offset[:, None]
+        pos = pos.reshape(-1, 2)
+        vel = self.vel.reshape(-1, 2)
+        i_idx, j_idx = grid_pairs(pos, contact_distance)
+        i_idx, j_idx = overlapping_pairs(pos, i_idx, j_idx, contact_distance)
+        restitution = self.particle_restitution[i_idx // self.num_particles]
+        resolve_batch(pos, vel, i_idx, j_idx, self.particle_radius, restitution)
+
+    def step(self, n=1):
+        """Advance every chamber by ``n`` time steps."""
+        for _ in range(n):
+            self.is_free_fall |= self.time >= self.start_time
+            self.vel[..., 1] -= self._gravity_step()[:, None] * self.dt
+            self.pos += self.vel * self.dt
+            self._handle_walls()
+            if self.particle_restitution is not None:
+                self._handle_particle_collisions()
+            self.time += self.dt
+            self.steps += 1
+
+    def run(self, until=None):
+        """Step until the simulation time reaches ``until`` (default ``simulation_time``)."""
+        if until is None:
+            until = self.simulation_time
+        while self.time < until:
+            self.step()
+
+    def kinetic_energy(self):
+        """Kinetic energy of each chamber's particles, shape (num_chambers,)."""
+        return 0.5 * self.particle_mass * (self.vel**2).sum(axis=(1, 2))
@@ -0,0 +1,311 @@
+import heapq
+import itertools
+
+import numpy as np
+
+from kernels import get_backend
+from placement import place_particles
+
+# Event kinds stored in the calendar
+WALL = 0
+PAIR = 1
+CELL = 2
+
+# Attributes that make up the state of an EventDrivenSimulation, see state_dict()
+STATE_SCALARS = ('num_particles', 'box_size', 'particle_radius', 'simulation_time', 'dim',
+                 'use_cells', 'cells_per_side', 'time', '_sequence', 'wall_collisions',
+                 'particle_collisions', 'cell_crossings', 'pair_checks')
+STATE_ARRAYS = ('pos', 'vel', 't_local', 'counts')
+
+# Every cell-list flight ends in a crossing event, so cells only pay off in
+# large systems: they are sized to hold about CELL_OCCUPANCY particles, and
+# use_cells=None turns them on from CELL_MIN_PARTICLES particles (below
+# that all-pairs prediction is faster, see the README)
+CELL_OCCUPANCY = 8
+CELL_MIN_PARTICLES = 2000
+
+
+class EventDrivenSimulation:
+    """Exact event-driven hard spheres in a cube (Python port of Microgravity-simulation-0.1).
+
+    Particles fly ballistically between collisions; walls reflect the normal
+    velocity component and equal-mass particles collide elastically, exactly
+    as in the MATLAB script. Instead of recomputing every wall and pair time
+    after each event, predicted events sit in a heap. Each particle keeps a
+    collision counter, and an event is stale once the counter of a particle
+    it involves has moved on. After a collision only the particles involved
+    are re-predicted.
+
+    Particles are advanced lazily: ``pos[i]`` is the position at the
+    particle's own time ``t_local[i]``; call ``positions()`` for the state at
+    the current simulation time.
+
+    With ``use_cells`` the cube is divided into a grid of cells at least one
+    diameter wide, holding about ``CELL_OCCUPANCY`` particles each. Each
+    particle tracks its cell through cell-crossing events, and collision
+    prediction only looks at the particles in the 3**dim neighbouring
+    cells, which keeps the cost of an event independent of the particle
+    count. The crossing events make small systems slower than all-pairs
+    prediction: in 3-D at 5 % volume fraction the cells win from about
+    1500-2000 particles, so ``use_cells=None`` (the default) enables them
+    from ``CELL_MIN_PARTICLES``.
+    """
+
+    def __init__(self, num_particles=10, box_size=1.0, particle_radius=0.01, max_speed=0.1,
+                 simulation_time=10.0, dim=3, use_cells=None, backend=None, seed=None):
+        self.num_particles = num_particles
+        self.box_size = box_size                  # Side length of the cubic container (m)
+        self.particle_radius = particle_radius    # Radius of particles (m)
+        self.simulation_time = simulation_time    # Default end time for run()
+        self.dim = dim
+        self.kernels = get_backend(backend)
+        self.rng = np.random.default_rng(seed)
+
+        # Initialize non-overlapping particle positions and velocities in
+        # [-max_speed, max_speed] per component
+        r = particle_radius
+        self.pos = place_particles(num_particles, np.full(dim, r), np.full(dim, box_size - r), r, self.rng)
+        self.vel = max_speed * (2 * self.rng.random((num_particles, dim)) - 1)
+        self.t_local = np.zeros(num_particles)
+
+        # Simulation state
+        self.time = 0.0
+        self.counts = np.zeros(num_particles, dtype=np.int64)
+        self.events = []
+        self._sequence = 0
+        self.wall_collisions = 0
+        self.particle_collisions = 0
+        self.cell_crossings = 0
+        self.pair_checks = 0
+
+        # Cell grid: cells_per_side cells of width cell_size >= 2r per axis
+        if use_cells is None:
+            use_cells = num_particles >= CELL_MIN_PARTICLES
+        per_side = (num_particles / CELL_OCCUPANCY) ** (1 / dim)
+        self.cells_per_side = max(min(int(box_size // (2 * particle_radius)), int(per_side)), 1)
+        self.use_cells = use_cells and self.cells_per_side >= 3
+        if self.use_cells:
+            self.cell_size = box_size / self.cells_per_side
+            self.cell = np.clip((self.pos // self.cell_size).astype(np.int64), 0, self.cells_per_side - 1)
+            self.members = {}
+            for i in range(num_particles):
+                self.members.setdefault(self._cell_key(self.cell[i]), set()).add(i)
+            self._neighbour_offsets = np.array(list(itertools.product((-1, 0, 1), repeat=dim)))
+
+        for i in range(num_particles):
+            self._predict(i)
+
+    def state_dict(self):
+        """Everything needed to continue this run exactly, the pending event calendar included.
+
+        The calendar is stored as columns in heap order, so restoring it
+        gives back the same heap and the same sequence of events.
+        """
+        state = {name: getattr(self, name) for name in STATE_SCALARS}
+        state.update({name: getattr(self, name).copy() for name in STATE_ARRAYS})
+        if self.use_cells:
+            state['cell'] = self.cell.copy()
+        state['event_times'] = np.array([event[0] for event in self.events], dtype=float)
+        state['event_fields'] = np.array([event[1:] for event in self.events], dtype=np.int64).reshape(-1, 6)
+        state['backend'] = self.kernels.name
+        state['rng'] = self.rng.bit_generator.state
+        return state
+
+    def load_state_dict(self, state):
+        """Restore the state saved by ``state_dict``, replacing this simulation's."""
+        for name in STATE_SCALARS:
+            setattr(self, name, state[name])
+        self.pos = np.array(state['pos'], dtype=float)
+        self.vel = np.array(state['vel'], dtype=float)
+        self.t_local = np.array(state['t_local'], dtype=float)
+        self.counts = np.array(state['counts'], dtype=np.int64)
+        self.kernels = get_backend(state['backend'])
+        self.rng = np.random.default_rng()
+        self.rng.bit_generator.state = state['rng']
+        self.events = [(t, *fields) for t, fields in zip(np.asarray(state['event_times']).tolist(),
+                                                         np.asarray(state['event_fields']).tolist())]
+        if self.use_cells:
+            self.cell_size = self.box_size / self.cells_per_side
+            self.cell = np.array(state['cell'], dtype=np.int64)
+            self.members = {}
+            for i in range(self.num_particles):
+                self.members.setdefault(self._cell_key(self.cell[i]), set()).add(i)
+            self._neighbour_offsets = np.array(list(itertools.product((-1, 0, 1), repeat=self.dim)))
+
+    @classmethod
+    def from_state_dict(cls, state):
+        """A simulation restored from ``state_dict`` without placing particles again."""
+        sim = cls.__new__(cls)
+        sim.load_state_dict(state)
+        return sim
+
+    def _position(self, idx, t):
+        return self.pos[idx] + self.vel[idx] * (t - self.t_local[idx])[..., None]
+
+    def _advance(self, i):
+        self.pos[i] += self.vel[i] * (self.time - self.t_local[i])
+        self.t_local[i] = self.time
+
+    def _push(self, t, kind, i, j):
+        count_j = self.counts[j] if kind == PAIR else 0
+        heapq.heappush(self.events, (t, self._sequence, kind, i, j, self.counts[i], count_j))
+        self._sequence += 1
+
+    def _wall_time(self, i):
+        # Time until particle i reaches a wall, and along which axis
+        p = self._position(i, self.time)
+        v = self.vel[i]
+        r, L = self.particle_radius, self.box_size
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_wall = np.where(v > 0, (L - r - p) / v, np.where(v < 0, (r - p) / v, np.inf))
+        axis = int(np.argmin(t_wall))
+        return self.time + max(t_wall[axis], 0.0), axis
+
+    def _pair_times(self, i, others):
+        # Collision times of particle i with each of ``others`` (inf if none)
+        if len(others) == 0:
+            return np.empty(0)
+        self.pair_checks += len(others)
+        t = self.kernels.pair_times(self._position(i, self.time), self.vel[i],
+                                    self._position(others, self.time), self.vel[others],
+                                    2 * self.particle_radius)
+        return self.time + t
+
+    def _cell_key(self, cell):
+        return int(np.ravel_multi_index(tuple(cell), (self.cells_per_side,) * self.dim))
+
+    def _partners(self, i):
+        if not self.use_cells:
+            return np.delete(np.arange(self.num_particles), i)
+        # Members of the neighbouring cells, i excluded
+        neighbours = self.cell[i] + self._neighbour_offsets
+        inside = np.all((neighbours >= 0) & (neighbours < self.cells_per_side), axis=1)
+        keys = np.ravel_multi_index(tuple(neighbours[inside].T), (self.cells_per_side,) * self.dim)
+        members = itertools.chain.from_iterable(self.members.get(k, ()) for k in keys.tolist())
+        others = np.fromiter(members, dtype=np.intp)
+        return others[others != i]
+
+    def _crossing_time(self, i):
+        # Time until particle i leaves its cell, and the axis/direction code
+        p = self._position(i, self.time)
+        v = self.vel[i]
+        cell = self.cell[i]
+        lower = cell * self.cell_size
+        upper = (cell + 1) * self.cell_size
+        # Boundaries on the outside of the grid are never crossed (walls come first)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_cross = np.where((v > 0) & (cell < self.cells_per_side - 1), (upper - p) / v,
+                               np.where((v < 0) & (cell > 0), (lower - p) / v, np.inf))
+        axis = int(np.argmin(t_cross))
+        return self.time + max(t_cross[axis], 0.0), 2 * axis + int(v[axis] > 0)
+
+    def _predict(self, i):
+        # Schedule the earliest event of particle i: one calendar entry per particle
+        t_wall, axis = self._wall_time(i)
+        others = self._partners(i)
+        t_pair = self._pair_times(i, others)
+        t_cross, crossing = self._crossing_time(i) if self.use_cells else (np.inf, 0)
+        t_pair_min = t_pair.min() if len(t_pair) else np.inf
+        if t_pair_min < min(t_wall, t_cross):
+            k = int(np.argmin(t_pair))
+            self._push(t_pair[k], PAIR, i, int(others[k]))
+        elif t_cross < t_wall:
+            self._push(t_cross, CELL, i, crossing)
+        elif np.isfinite(t_wall):
+            self._push(t_wall, WALL, i, axis)
+
+    def _next_event(self, until):
+        # Pop the next valid event at or before ``until``, or None
+        while self.events and self.events[0][0] <= until:
+            t, _, kind, i, j, count_i, count_j = heapq.heappop(self.events)
+            if self.counts[i] != count_i:
+                continue  # i has collided since; its new event is already queued
+            if kind == PAIR and self.counts[j] != count_j:
+                # The partner changed course, i did not: predict i afresh
+                self.time = max(self.time, t)
+                self._predict(i)
+                continue
+            return t, kind, i, j
+        return None
+
+    def _handle(self, kind, i, j, sink=None):
+        self._advance(i)
+        if kind == CELL:
+            # Move i to the neighbouring cell; its trajectory is unchanged, so
+            # the counter stays and other particles' events with i stay valid
+            self.members[self._cell_key(self.cell[i])].discard(i)
+            axis, direction = divmod(j, 2)
+            self.cell[i, axis] += 1 if direction else -1
+            self.members.setdefault(self._cell_key(self.cell[i]), set()).add(i)
+            self.cell_crossings += 1
+            self._predict(i)
+            return
+        if kind == WALL:
+            self.vel[i, j] = -self.vel[i, j]  # Reverse velocity component
+            self.counts[i] += 1
+            self.wall_collisions += 1
+            if sink is not None:
+                sink.append_changes(self.time, i, self.pos[i], self.vel[i])
+            self._predict(i)
+            return
+        self._advance(j)
+        # Normal vector at collision
+        n = self.pos[j] - self.pos[i]
+        n /= np.linalg.norm(n)
+        # Relative velocity projection
+        v_rel = np.dot(self.vel[i] - self.vel[j], n)
+        # Update velocities (equal masses, elastic collision)
+        self.vel[i] -= v_rel * n
+        self.vel[j] += v_rel * n
+        self.counts[i] += 1
+        self.counts[j] += 1
+        self.particle_collisions += 1
+        if sink is not None:
+            pair = [i, j]
+            sink.append_changes(self.time, pair, self.pos[pair], self.vel[pair])
+        self._predict(i)
+        self._predict(j)
+
+    def record_state(self, sink):
+        """Write every particle's current state to a deltas-mode ``sink`` (a keyframe)."""
+        sink.append_changes(self.time, np.arange(self.num_particles), self.positions(), self.vel)
+
+    def step(self, n=1, sink=None):
+        """Process the next ``n`` events (collisions and cell crossings); returns how many were processed.
+
+        ``sink`` (a deltas-mode ``trajectory.TrajectoryWriter``) receives the
+        new state of the particles changed by each collision.
+        """
+        for done in range(n):
+            event = self._next_event(np.inf)
+            if event is None:
+                return done
+            self.time, kind, i, j = event
+            self._handle(kind, i, j, sink)
+        return n
+
+    def run(self, until=None, sink=None, checkpoint=None):
+        """Process every collision up to ``until`` (default ``simulation_time``).
+
+        ``checkpoint`` (a ``checkpoint.Checkpointer``) gets to save the
+        state after every event.
+        """
+        if until is None:
+            until = self.simulation_time
+        while True:
+            event = self._next_event(until)
+            if event is None:
+                break
+            self.time, kind, i, j = event
+            self._handle(kind, i, j, sink)
+            if checkpoint is not None:
+                checkpoint.after_step(self)
+        self.time = max(self.time, until)
+
+    def positions(self):
+        """Positions of all particles at the current simulation time."""
+        return self._position(np.arange(self.num_particles), self.time)
+
+    def kinetic_energy(self):
+        # Per unit particle mass
+        return 0.5 * float(np.einsum('ij,ij->', self.vel, self.vel))
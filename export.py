@@ -0,0 +1,233 @@
+"""Render a run straight to a video or an image sequence, without a window.
+
+Frames are sampled at a fixed output rate, independent of the simulation's
+``dt``, from a live ``Simulation`` or from a file written by
+``trajectory.TrajectoryWriter``. They are rasterized with matplotlib's Agg
+canvas in a process pool and the raw RGB buffers are piped, in order, to
+an ``ffmpeg`` subprocess; without ffmpeg (or for a ``.png`` pattern) the
+frames are saved as PNG files instead::
+
+    python export.py --preset protoypr03 --out protoypr03.mp4 --fps 30 --speed 10
+
+    python export.py --trajectory run.npy --box 50 25 --radius 0.9 --out frames/%05d.png
+"""
+import argparse
+import collections
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import PRESETS, Simulation
+from trajectory import TrajectoryReader
+
+# Frames rendered per task handed to a worker process
+CHUNK_FRAMES = 32
+
+
+def frame_times(start, end, fps=30, speed=1.0):
+    """Simulation times of the output frames: ``fps`` per second of video, ``speed`` sim seconds each."""
+    count = int(np.floor((end - start) * fps / speed + 1e-9)) + 1
+    return start + np.arange(count) * speed / fps
+
+
+def sample_simulation(sim, times):
+    """Run ``sim`` forward and return its positions at each of ``times``, shape (frames, N, 2).
+
+    A 3-D simulation is seen from the side: width against height. Called
+    once per chunk of frames, with ``times`` continuing where the last
+    call stopped.
+    """
+    positions = np.empty((len(times), sim.num_particles, 2))
+    for k, t in enumerate(times):
+        # Half a step of slack so accumulated rounding in sim.time does not cost a step
+        while sim.time < t - sim.dt / 2:
+            sim.step()
+        positions[k] = sim.pos[:, [0, -1]]
+    return positions
+
+
+def sample_trajectory(reader, times):
+    """Positions of a ``TrajectoryReader`` at each of ``times`` (the last frame at or before each)."""
+    if reader.mode == 'frames':
+        indices = np.maximum(np.searchsorted(reader.times, times, side='right') - 1, 0)
+        return np.asarray(reader.records['pos'][indices])
+    return np.stack([reader.state_at(t)[0] for t in times])
+
+
+# ### Rendering (runs in the worker processes)
+
+_canvas = None
+
+
+def _init_renderer(box, radius, size, color):
+    # One figure per process, reused for every frame it renders
+    global _canvas
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import EllipseCollection
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Rectangle
+
+    width, height = size
+    fig = Figure(figsize=(width / 100, height / 100), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_xlim(0, box[0])
+    ax.set_ylim(0, box[1])
+    ax.set_axis_off()
+    ax.add_patch(Rectangle((0, 0), box[0], box[1], edgecolor='black', facecolor='none', linewidth=2))
+    particles = EllipseCollection(2 * radius, 2 * radius, 0, units='xy', offsets=np.zeros((1, 2)),
+                                  offset_transform=ax.transData, facecolor=color, edgecolor=color)
+    ax.add_collection(particles)
+    label = ax.text(0.02, 0.98, '', transform=ax.transAxes, ha='left', va='top')
+    # Draw the static chamber once; frames restore it and draw only what moves
+    particles.set_visible(False)
+    canvas.draw()
+    particles.set_visible(True)
+    _canvas = (canvas, ax, particles, label, canvas.copy_from_bbox(fig.bbox))
+
+
+def _render_chunk(job):
+    # Raw RGB bytes of each frame, or None per frame when writing PNGs here
+    times, positions, pattern, first = job
+    canvas, ax, particles, label, background = _canvas
+    frames = []
+    for k, (t, pos) in enumerate(zip(times, positions)):
+        canvas.restore_region(background)
+        particles.set_offsets(pos[:, [0, -1]])
+        label.set_text(f't = {t:.2f} s')
+        ax.draw_artist(particles)
+        ax.draw_artist(label)
+        rgb = np.asarray(canvas.buffer_rgba())[..., :3]
+        if pattern is None:
+            frames.append(rgb.tobytes())
+        else:
+            import matplotlib.image
+            matplotlib.image.imsave(pattern % (first + k), rgb)
+            frames.append(None)
+    return frames
+
+
+# ### Export
+
+def _even_size(box, width):
+    # yuv420p needs even pixel dimensions
+    width = 2 * int(round(width / 2))
+    height = 2 * int(round(width * box[1] / box[0] / 2))
+    return width, height
+
+
+def export(source, path, fps=30, speed=1.0, start=None, end=None, box=None, radius=None,
+           width=480, color='blue', workers=None, ffmpeg=None):
+    """Render ``source`` between ``start`` and ``end`` (simulation seconds) to ``path``.
+
+    ``source`` is a ``Simulation`` (run forward from its current state), a
+    ``TrajectoryReader`` or the path of a trajectory file; files need
+    ``box=(width, height)`` and ``radius``, which the simulation supplies
+    itself. 3-D trajectories are seen from the side, width against height,
+    like 3-D simulations.
+
+    ``path`` ending in ``.png`` is a ``%``-style pattern for an image
+    sequence (e.g. ``frames/%05d.png``); anything else goes through
+    ``ffmpeg`` (default: the one on ``PATH``). If there is no ffmpeg, the
+    frames are written as PNGs next to ``path`` instead. Returns the path
+    or pattern written and the number of frames.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        source = TrajectoryReader(source)
+    if isinstance(source, Simulation):
+        box = box or (source.tube_width, source.tube_height)
+        radius = source.particle_radius if radius is None else radius
+        start = source.time if start is None else start
+        end = source.simulation_time if end is None else end
+    else:
+        if box is None or radius is None:
+            raise ValueError("exporting a trajectory file needs box=(width, height) and radius")
+        start = float(source.times[0]) if start is None else start
+        end = float(source.times[-1]) if end is None else end
+
+    times = frame_times(start, end, fps, speed)
+    sample = sample_simulation if isinstance(source, Simulation) else sample_trajectory
+
+    ffmpeg = ffmpeg or shutil.which('ffmpeg')
+    pattern = None
+    if str(path).endswith('.png'):
+        pattern = str(path)
+    elif ffmpeg is None:
+        # No encoder: fall back to an image sequence in <path stem>_frames/
+        pattern = os.path.join(os.path.splitext(str(path))[0] + '_frames', '%05d.png')
+        print(f"ffmpeg not found, writing PNG frames to {os.path.dirname(pattern)}")
+    if pattern is not None and os.path.dirname(pattern):
+        os.makedirs(os.path.dirname(pattern), exist_ok=True)
+
+    size = _even_size(box, width)
+    encoder = None
+    if pattern is None:
+        encoder = subprocess.Popen(
+            [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+             '-s', f'{size[0]}x{size[1]}', '-r', str(fps), '-i', '-',
+             '-pix_fmt', 'yuv420p', str(path)],
+            stdin=subprocess.PIPE)
+
+    workers = workers or os.cpu_count()
+    # Positions are sampled one chunk at a time as jobs are submitted, so
+    # only the chunks in flight are ever held in memory
+    jobs = ((times[k:k + CHUNK_FRAMES], sample(source, times[k:k + CHUNK_FRAMES]), pattern, k)
+            for k in range(0, len(times), CHUNK_FRAMES))
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer,
+                                 initargs=(box, radius, size, color)) as pool:
+            # A bounded window of chunks in flight keeps memory flat for long runs,
+            # and taking them in submission order keeps the frames in order
+            pending = collections.deque()
+            for job in jobs:
+                pending.append(pool.submit(_render_chunk, job))
+                if len(pending) >= 2 * workers:
+                    _write(encoder, pending.popleft().result())
+            while pending:
+                _write(encoder, pending.popleft().result())
+    finally:
+        if encoder is not None:
+            encoder.stdin.close()
+            if encoder.wait():
+                raise RuntimeError(f"ffmpeg exited with status {encoder.returncode}")
+    return (pattern or str(path)), len(times)
+
+
+def _write(encoder, frames):
+    if encoder is not None:
+        for frame in frames:
+            encoder.stdin.write(frame)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--preset', choices=sorted(PRESETS))
+    source.add_argument('--trajectory', help='file written by trajectory.TrajectoryWriter')
+    parser.add_argument('--out', required=True, help='video file, or a %%-pattern ending in .png')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--speed', type=float, default=1.0, help='simulated seconds per video second')
+    parser.add_argument('--start', type=float)
+    parser.add_argument('--end', type=float)
+    parser.add_argument('--box', type=float, nargs=2, metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--radius', type=float)
+    parser.add_argument('--width', type=int, default=480, help='frame width in pixels')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    if args.preset:
+        source = Simulation.from_preset(args.preset, seed=args.seed)
+    else:
+        source = TrajectoryReader(args.trajectory)
+    written, count = export(source, args.out, fps=args.fps, speed=args.speed, start=args.start,
+                            end=args.end, box=args.box, radius=args.radius, width=args.width,
+                            workers=args.workers)
+    print(f"{count} frames written to {written}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Streaming diagnostics for long ``Simulation`` runs.
+
+Attach an ``Instruments`` to a simulation (``Simulation(instruments=...)``
+or ``sim.instruments = ...``) and every step reports its timing, pair
+checks and hits, wall hits, kinetic energy, momentum and the impulses
+delivered by contacts (walls and particles), the proxy for residual
+microgravity. Everything is accumulated in constant memory: running
+mean/variance (Welford), fixed-bin histograms and a ring buffer of the
+last per-step records. ``summary()`` is a JSON-ready snapshot that can be
+scraped at any time, and with ``log`` a JSON line is appended to the
+file every ``log_every`` steps.
+"""
+import json
+import time
+
+import numpy as np
+
+
+def step_dtype(dim=2):
+    """Per-step record kept in the ring buffer, for a ``dim``-dimensional simulation."""
+    return np.dtype([('step', np.int64), ('time', np.float64), ('dt', np.float64),
+                     ('seconds', np.float64), ('pair_checks', np.int64),
+                     ('pair_hits', np.int64), ('wall_hits', np.int64),
+                     ('kinetic_energy', np.float64), ('momentum', np.float64, (dim,)),
+                     ('g_eff', np.float64), ('max_impulse', np.float64)])
+
+
+# Per-step record of the 2-D engine
+STEP_DTYPE = step_dtype(2)
+
+
+class RunningStats:
+    """Count, mean, variance, min and max of a stream, in O(1) memory.
+
+    ``add`` takes one value (Welford's update, in plain floats); ``update``
+    merges a whole array into the running moments in one go (Chan et al.'s
+    parallel form of the same algorithm), so adding many samples per step
+    costs one pass in NumPy.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def as_dict(self):
+        if not self.count:
+            return {'count': 0}
+        return {'count': int(self.count), 'mean': float(self.mean), 'std': float(np.sqrt(self.variance)),
+                'min': float(self.min), 'max': float(self.max)}
+
+
+class Histogram:
+    """Counts of a stream in fixed bins ``edges``, plus under- and overflow."""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        # Slot 0 is underflow, slot -1 overflow
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+
+    @classmethod
+    def log_spaced(cls, low, high, num_bins=40):
+        return cls(np.geomspace(low, high, num_bins + 1))
+
+    def update(self, values):
+        slots = np.searchsorted(self.edges, np.asarray(values, dtype=float).ravel(), side='right')
+        self.counts += np.bincount(slots, minlength=len(self.counts))
+
+    def as_dict(self):
+        return {'edges': self.edges.tolist(), 'counts': self.counts[1:-1].tolist(),
+                'underflow': int(self.counts[0]), 'overflow': int(self.counts[-1])}
+
+
+class RingBuffer:
+    """The last ``capacity`` records of a structured dtype, oldest first on read."""
+
+    def __init__(self, capacity, dtype):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.written = 0
+
+    def push(self, record):
+        """Store ``record`` (a tuple in dtype field order), overwriting the oldest once full."""
+        self.data[self.written % len(self.data)] = record
+        self.written += 1
+
+    def records(self):
+        if self.written <= len(self.data):
+            return self.data[:self.written].copy()
+        start = self.written % len(self.data)
+        return np.concatenate([self.data[start:], self.data[:start]])
+
+
+class Instruments:
+    """Step-loop hooks of a ``Simulation``: counters, streaming statistics and a log.
+
+    The simulation calls ``begin_step`` before it moves the particles,
+    ``before_contacts`` before walls and particle collisions are resolved
+    and ``end_step`` once the step is done. Contact impulses are measured
+    as ``particle_mass * |Δv|`` of every particle whose velocity the
+    contact phase changed (the chamber recoil of a coupled run excluded).
+    """
+
+    def __init__(self, capacity=1024, impulse_edges=None, log=None, log_every=100):
+        self.steps = RingBuffer(capacity, STEP_DTYPE)
+        self.step_seconds = RunningStats()
+        self.kinetic_energy = RunningStats()
+        self.impulse = RunningStats()
+        if impulse_edges is None:
+            self.impulse_histogram = Histogram.log_spaced(1e-2, 1e6)
+        else:
+            self.impulse_histogram = Histogram(impulse_edges)
+        self.residual_accel = RunningStats()
+        self.totals = {'steps': 0, 'pair_checks': 0, 'pair_hits': 0, 'wall_hits': 0}
+        self.log = log
+        self.log_every = log_every
+        self._started = 0.0
+        self._counters = (0, 0, 0)
+        self._vel = None
+
+    def begin_step(self, sim):
+        if self.steps.data.dtype['momentum'].shape != (sim.dim,):
+            # Records of a 3-D simulation (only before the first step)
+            self.steps = RingBuffer(len(self.steps.data), step_dtype(sim.dim))
+        self._counters = (sim.pair_checks, sim.pair_hits, sim.wall_hits)
+        self._started = time.perf_counter()
+
+    def before_contacts(self, sim):
+        self._vel = sim.vel.copy()
+
+    def end_step(self, sim):
+        seconds = time.perf_counter() - self._started
+        pair_checks = sim.pair_checks - self._counters[0]
+        pair_hits = sim.pair_hits - self._counters[1]
+        wall_hits = sim.wall_hits - self._counters[2]
+
+        # Velocity change from contacts, less the frame shift of a recoiling chamber
+        dv = sim.vel - self._vel
+        coupled = sim.coupled and sim.is_free_fall
+        if coupled:
+            dv += sim.residual_accel * sim.dt
+            self.residual_accel.add(float(np.sqrt(sim.residual_accel @ sim.residual_accel)))
+        dv = np.sqrt(np.einsum('ij,ij->i', dv, dv))
+        impulses = (sim.particle_mass * dv)[dv > 1e-9 * (1 + np.abs(self._vel).max(initial=0.0))]
+        if len(impulses):
+            self.impulse.update(impulses)
+            self.impulse_histogram.update(impulses)
+
+        kinetic_energy = sim.kinetic_energy()
+        self.step_seconds.add(seconds)
+        self.kinetic_energy.add(kinetic_energy)
+        self.totals['steps'] += 1
+        self.totals['pair_checks'] += pair_checks
+        self.totals['pair_hits'] += pair_hits
+        self.totals['wall_hits'] += wall_hits
+
+        self.steps.push((sim.steps, sim.time, sim.dt, seconds, pair_checks, pair_hits, wall_hits,
+                         kinetic_energy, sim.momentum(), sim.g_eff,
+                         impulses.max(initial=0.0)))
+
+        if self.log is not None and self.totals['steps'] % self.log_every == 0:
+            self.write_log(sim)
+
+    def summary(self):
+        """A JSON-serializable snapshot of every counter and statistic."""
+        return {
+            'totals': {name: int(value) for name, value in self.totals.items()},
+            'step_seconds': self.step_seconds.as_dict(),
+            'kinetic_energy': self.kinetic_energy.as_dict(),
+            'impulse': self.impulse.as_dict(),
+            'impulse_histogram': self.impulse_histogram.as_dict(),
+            'residual_accel': self.residual_accel.as_dict(),
+        }
+
+    def write_log(self, sim):
+        """Append one JSON line with the simulation time and ``summary()`` to ``log``."""
+        line = {'step': sim.steps, 'time': sim.time, **self.summary()}
+        if isinstance(self.log, str):
+            with open(self.log, 'a') as f:
+                f.write(json.dumps(line) + '\n')
+        else:
+            self.log.write(json.dumps(line) + '\n')
+            self.log.flush()
@@ -0,0 +1,234 @@
+"""Hot loops of the engines, with a NumPy and an optional numba backend.
+
+Both backends do the same floating-point operations in the same order, so
+they give identical results. Every kernel first casts its scalar arguments
+to the dtype of the particle arrays, so ``float32`` runs compute in single
+precision on both. The numba backend compiles the scalar-heavy loops
+(sequential collision resolution, per-particle wall handling, event-time
+prediction) to machine code.
+``get_backend()`` picks numba when it is installed, unless the
+``AGA_BACKEND`` environment variable or the ``name`` argument says
+otherwise.
+"""
+import importlib.util
+import math
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from collisions import resolve_sequential, resolve_sequential_polydisperse
+
+BACKENDS = ('numpy', 'numba')
+
+
+# ### NumPy backend
+
+def advance_numpy(pos, vel, accel, dt):
+    # Gravity acts along the last (vertical) axis, downward, then positions
+    # move with the new velocities
+    vel[:, -1] -= vel.dtype.type(accel * dt)
+    pos += vel * vel.dtype.type(dt)
+
+
+def reflect_walls_numpy(pos, vel, box, r, e, top_wall):
+    # All walls in one pass: along every axis a particle outside [r, box - r]
+    # is put back on the wall and its velocity component reflected. The top
+    # wall (upper end of the last axis) is optional; r is the radius or an
+    # array of per-particle radii
+    if np.ndim(r):
+        r = r[:, None]
+    else:
+        r = pos.dtype.type(r)
+    e = vel.dtype.type(e)
+    upper = box - r
+    if not top_wall:
+        upper = np.where(np.arange(len(box)) == len(box) - 1, np.inf, upper)
+    low = pos < r
+    high = pos > upper
+    hit = low | high
+    vel[hit] *= -e
+    np.copyto(pos, r, where=low)
+    np.copyto(pos, upper, where=high)
+    return int(np.count_nonzero(hit))
+
+
+def pair_times_numpy(p, v, pos, vel, diameter):
+    # Time until the sphere at p (velocity v) touches each of pos/vel, inf if never
+    d = p - pos      # Relative position
+    w = v - vel      # Relative velocity
+    a = w[:, 0] * w[:, 0]
+    b = d[:, 0] * w[:, 0]
+    c = d[:, 0] * d[:, 0]
+    for k in range(1, d.shape[1]):
+        a += w[:, k] * w[:, k]
+        b += d[:, k] * w[:, k]
+        c += d[:, k] * d[:, k]
+    c -= diameter * diameter
+    discriminant = b * b - a * c
+    # Only approaching pairs (b < 0) whose paths come within a diameter collide
+    hit = (b < 0) & (discriminant > 0)
+    t = np.full(len(pos), np.inf)
+    t[hit] = c[hit] / (-b[hit] + np.sqrt(discriminant[hit]))
+    return np.maximum(t, 0.0)
+
+
+# ### numba backend
+
+def advance_loop(pos, vel, accel, dt):
+    step = vel.dtype.type(accel * dt)
+    h = vel.dtype.type(dt)
+    top = pos.shape[1] - 1
+    for i in range(pos.shape[0]):
+        vel[i, top] -= step
+        for k in range(pos.shape[1]):
+            pos[i, k] += vel[i, k] * h
+
+
+def reflect_walls_loop(pos, vel, box, radius, restitution, top_wall):
+    r = pos.dtype.type(radius)
+    e = vel.dtype.type(restitution)
+    hits = 0
+    top = pos.shape[1] - 1
+    for i in range(pos.shape[0]):
+        for k in range(pos.shape[1]):
+            if pos[i, k] < r:
+                vel[i, k] *= -e
+                pos[i, k] = r
+                hits += 1
+            elif (k < top or top_wall) and pos[i, k] > box[k] - r:
+                vel[i, k] *= -e
+                pos[i, k] = box[k] - r
+                hits += 1
+    return hits
+
+
+def reflect_walls_polydisperse_loop(pos, vel, box, radius, restitution, top_wall):
+    e = vel.dtype.type(restitution)
+    hits = 0
+    top = pos.shape[1] - 1
+    for i in range(pos.shape[0]):
+        r = radius[i]
+        for k in range(pos.shape[1]):
+            if pos[i, k] < r:
+                vel[i, k] *= -e
+                pos[i, k] = r
+                hits += 1
+            elif (k < top or top_wall) and pos[i, k] > box[k] - r:
+                vel[i, k] *= -e
+                pos[i, k] = box[k] - r
+                hits += 1
+    return hits
+
+
+def resolve_sequential_loop(pos, vel, i_idx, j_idx, particle_radius, restitution):
+    dim = pos.shape[1]
+    # Scalars and constants in the precision of the arrays, as in collisions.py
+    zero, one, two = vel.dtype.type(0), vel.dtype.type(1), vel.dtype.type(2)
+    r = pos.dtype.type(particle_radius)
+    e = vel.dtype.type(restitution)
+    for p in range(len(i_idx)):
+        i = i_idx[p]
+        j = j_idx[p]
+        distance_sq = zero
+        for k in range(dim):
+            dk = pos[i, k] - pos[j, k]
+            distance_sq += dk * dk
+        distance = np.sqrt(distance_sq)
+        if 0 < distance < two * r:
+            v_rel_normal = zero
+            for k in range(dim):
+                v_rel_normal += (vel[i, k] - vel[j, k]) * ((pos[i, k] - pos[j, k]) / distance)
+            if v_rel_normal < 0:
+                impulse = -(one + e) * v_rel_normal / two
+                for k in range(dim):
+                    nk = (pos[i, k] - pos[j, k]) / distance
+                    vel[i, k] += impulse * nk
+                    vel[j, k] -= impulse * nk
+
+
+def resolve_sequential_polydisperse_loop(pos, vel, i_idx, j_idx, particle_radius, particle_mass,
+                                         restitution):
+    dim = pos.shape[1]
+    zero, one = vel.dtype.type(0), vel.dtype.type(1)
+    e = vel.dtype.type(restitution)
+    for p in range(len(i_idx)):
+        i = i_idx[p]
+        j = j_idx[p]
+        distance_sq = zero
+        for k in range(dim):
+            dk = pos[i, k] - pos[j, k]
+            distance_sq += dk * dk
+        distance = np.sqrt(distance_sq)
+        if 0 < distance < particle_radius[i] + particle_radius[j]:
+            v_rel_normal = zero
+            for k in range(dim):
+                v_rel_normal += (vel[i, k] - vel[j, k]) * ((pos[i, k] - pos[j, k]) / distance)
+            if v_rel_normal < 0:
+                mi = particle_mass[i]
+                mj = particle_mass[j]
+                impulse = -(one + e) * v_rel_normal * (mi * mj / (mi + mj))
+                for k in range(dim):
+                    nk = (pos[i, k] - pos[j, k]) / distance
+                    vel[i, k] += impulse / mi * nk
+                    vel[j, k] -= impulse / mj * nk
+
+
+def pair_times_loop(p, v, pos, vel, diameter):
+    t = np.empty(pos.shape[0])
+    for j in range(pos.shape[0]):
+        a = (v[0] - vel[j, 0]) * (v[0] - vel[j, 0])
+        b = (p[0] - pos[j, 0]) * (v[0] - vel[j, 0])
+        c = (p[0] - pos[j, 0]) * (p[0] - pos[j, 0])
+        for k in range(1, pos.shape[1]):
+            a += (v[k] - vel[j, k]) * (v[k] - vel[j, k])
+            b += (p[k] - pos[j, k]) * (v[k] - vel[j, k])
+            c += (p[k] - pos[j, k]) * (p[k] - pos[j, k])
+        c -= diameter * diameter
+        discriminant = b * b - a * c
+        if b < 0 and discriminant > 0:
+            t[j] = max(c / (-b + math.sqrt(discriminant)), 0.0)
+        else:
+            t[j] = math.inf
+    return t
+
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """The kernel namespace for ``name`` ('numpy', 'numba' or 'auto'/None).
+
+    'auto' (the default, overridable with ``AGA_BACKEND``) uses numba when it
+    is installed and NumPy otherwise; asking for 'numba' explicitly without
+    numba installed raises ``ImportError``. numba is only imported here, the
+    first time its backend is asked for, so runs on the NumPy backend start
+    without it.
+    """
+    if name is None:
+        name = os.environ.get('AGA_BACKEND', 'auto')
+    if name == 'auto':
+        name = 'numba' if importlib.util.find_spec('numba') is not None else 'numpy'
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend {name!r}, expected 'auto' or one of {BACKENDS}")
+    if name not in _backends:
+        if name == 'numpy':
+            _backends[name] = SimpleNamespace(
+                name='numpy', advance=advance_numpy, reflect_walls=reflect_walls_numpy,
+                reflect_walls_polydisperse=reflect_walls_numpy, resolve_sequential=resolve_sequential,
+                resolve_sequential_polydisperse=resolve_sequential_polydisperse,
+                pair_times=pair_times_numpy)
+        else:
+            try:
+                import numba
+            except ImportError:
+                raise ImportError("the numba backend needs the numba package") from None
+            # Without the GIL, so that parallel.py can run them on several threads
+            jit = numba.njit(cache=True, nogil=True)
+            _backends[name] = SimpleNamespace(
+                name='numba', advance=jit(advance_loop), reflect_walls=jit(reflect_walls_loop),
+                reflect_walls_polydisperse=jit(reflect_walls_polydisperse_loop),
+                resolve_sequential=jit(resolve_sequential_loop),
+                resolve_sequential_polydisperse=jit(resolve_sequential_polydisperse_loop),
+                pair_times=jit(pair_times_loop))
+    return _backends[name]
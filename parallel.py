@@ -0,0 +1,112 @@
+"""Multithreaded stepping of one large chamber, split into spatial slabs.
+
+Attach a ``SlabDecomposition`` to a batch-mode simulation
+(``Simulation(collision_mode='batch', parallel=SlabDecomposition())``) and
+every step runs on a thread pool: the integration and wall handling on
+fixed chunks of the particle arrays, the broad and narrow phase and the
+impulse computation on slabs of the chamber along its first axis. The
+kernels release the GIL (NumPy for large arrays, the numba backend is
+compiled with ``nogil``), so the threads run in parallel.
+
+Each slab takes the particles whose centre lies in it plus a halo: the
+particles of the next slab within one grid cell of the boundary. Pairs
+inside the halo belong to the next slab, so every contact is found by
+exactly one slab. The impulses of all slabs are summed per particle in
+slab order, after every slab is done, so the result depends on ``slabs``
+but never on ``workers`` or on how the threads are scheduled; with
+``slabs=1`` it is bit-identical to the serial batch resolver.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from collisions import apply_impulses, batch_impulses, contact_distance, grid_pairs, overlapping_pairs
+
+
+class SlabDecomposition:
+    """Step a ``Simulation`` on ``workers`` threads (default: all CPUs), in ``slabs`` slabs.
+
+    Slabs are at least one grid cell (the largest contact distance) wide,
+    so narrow chambers use fewer of them. Keep ``slabs`` a few times
+    ``workers`` to balance uneven particle densities. Every step pays a
+    fixed cost for its slab tasks, so below about 10**4 particles serial
+    stepping is faster (see ``benchmarks.py --workers``).
+    """
+
+    def __init__(self, workers=None, slabs=32):
+        if slabs < 1:
+            raise ValueError(f"slabs must be at least 1, got {slabs!r}")
+        self.workers = workers or os.cpu_count() or 1
+        self.slabs = slabs
+        self._pool = ThreadPoolExecutor(self.workers)
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        self._pool.shutdown()
+
+    def _chunks(self, num_particles):
+        bounds = np.linspace(0, num_particles, self.slabs + 1).astype(int)
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def advance(self, sim, accel):
+        """``kernels.advance`` on every chunk of particles."""
+        def task(chunk):
+            a, b = chunk
+            sim.kernels.advance(sim.pos[a:b], sim.vel[a:b], accel, sim.dt)
+        list(self._pool.map(task, self._chunks(sim.num_particles)))
+
+    def reflect_walls(self, sim):
+        """Wall handling of a simulation without a coupled chamber; returns the number of hits."""
+        reflect = sim.kernels.reflect_walls_polydisperse if sim.polydisperse else sim.kernels.reflect_walls
+
+        def task(chunk):
+            a, b = chunk
+            r = sim.particle_radius[a:b] if sim.polydisperse else sim.particle_radius
+            return reflect(sim.pos[a:b], sim.vel[a:b], sim.box, r, sim.wall_restitution, sim.top_wall)
+        return sum(self._pool.map(task, self._chunks(sim.num_particles)))
+
+    def slab_members(self, pos, width, cell_size):
+        """Particle indices (ascending) of each slab and of its halo."""
+        slabs = max(1, min(self.slabs, int(width // cell_size)))
+        edges = width / slabs * np.arange(1, slabs)
+        x = pos[:, 0]
+        slab = np.searchsorted(edges, x, side='right')
+        order = np.argsort(slab, kind='stable')
+        starts = np.searchsorted(slab[order], np.arange(slabs + 1))
+        members = [order[starts[s]:starts[s + 1]] for s in range(slabs)]
+        halos = [members[s + 1][x[members[s + 1]] < edges[s] + cell_size] for s in range(slabs - 1)]
+        halos.append(members[-1][:0])
+        return members, halos
+
+    def resolve_particle_collisions(self, sim):
+        """Batch-mode particle contacts; returns the number of pair checks and the touching pairs."""
+        cell_size = 2 * sim.max_radius
+        members, halos = self.slab_members(sim.pos, sim.box[0], cell_size)
+        mass = sim.particle_mass if sim.polydisperse else None
+
+        def task(slab):
+            own, halo = slab
+            local = np.concatenate([own, halo])
+            i_idx, j_idx = grid_pairs(sim.pos[local], cell_size)
+            # With i < j a pair starting in the halo lies entirely in it
+            keep = i_idx < len(own)
+            i_idx, j_idx = local[i_idx[keep]], local[j_idx[keep]]
+            # Halo particles can precede their partner in the particle order;
+            # report every pair as (low, high) like grid_pairs
+            i_idx, j_idx = np.minimum(i_idx, j_idx), np.maximum(i_idx, j_idx)
+            checks = len(i_idx)
+            i_idx, j_idx = overlapping_pairs(sim.pos, i_idx, j_idx,
+                                             contact_distance(sim.particle_radius, i_idx, j_idx))
+            dv_i, dv_j = batch_impulses(sim.pos, sim.vel, i_idx, j_idx, sim.particle_radius,
+                                        sim.particle_restitution, mass)
+            return checks, i_idx, j_idx, dv_i, dv_j
+
+        # Every slab reads the velocities at the start of the pass; they are
+        # only updated once all slabs are done
+        results = list(self._pool.map(task, zip(members, halos)))
+        checks, i_idx, j_idx, dv_i, dv_j = zip(*results)
+        i_idx, j_idx = np.concatenate(i_idx), np.concatenate(j_idx)
+        if len(i_idx):
+            apply_impulses(sim.vel, i_idx, j_idx, np.concatenate(dv_i), np.concatenate(dv_j))
+        return sum(checks), i_idx, j_idx
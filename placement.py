@@ -0,0 +1,186 @@
+"""Overlap-free initial particle positions in 2-D and 3-D boxes.
+
+``place_particles`` draws uniform random positions and rejects those that
+come within a diameter of an accepted particle, like the MATLAB script,
+but in vectorized batches checked against a cell grid instead of against
+every earlier particle. The cells are ``2r / sqrt(dim)`` wide, so each
+holds at most one centre and a candidate only needs the few cells within
+a diameter of its own. Sparse boxes keep the occupied cells as a sorted
+key array instead of a dense grid, so memory follows the particle count,
+not the box volume.
+
+Random sequential placement jams well below close packing (near 55 % of
+the area in 2-D, 38 % of the volume in 3-D). Denser requests, and runs
+where rejection stops making progress, use ``lattice_placement``: a
+random subset of the sites of a grid at least a diameter apart, each
+jittered within its own slot.
+"""
+import itertools
+import math
+
+import numpy as np
+
+# Packing fraction up to which random placement is tried, per dimension
+RANDOM_PACKING_LIMIT = {1: 0.6, 2: 0.45, 3: 0.3}
+
+
+def packing_fraction(num_particles, lower, upper, radius):
+    """Fraction of the box (centre range plus a radius margin) covered by the particles."""
+    dim = len(lower)
+    ball = math.pi ** (dim / 2) / math.gamma(dim / 2 + 1) * radius**dim
+    box = np.prod(np.asarray(upper, dtype=float) - lower + 2 * radius)
+    return num_particles * ball / box if box > 0 else np.inf
+
+
+def place_particles(num_particles, lower, upper, radius, rng, max_idle_rounds=10):
+    """``num_particles`` centres in the box ``lower <= x <= upper`` at least ``2 * radius`` apart.
+
+    ``lower`` and ``upper`` bound the centres per axis (shape ``(dim,)``).
+    Returns a ``(num_particles, dim)`` array; raises ``ValueError`` if the
+    particles do not fit even on a lattice.
+    """
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    dim = len(lower)
+    if num_particles == 0:
+        return np.empty((0, dim))
+    if packing_fraction(num_particles, lower, upper, radius) <= RANDOM_PACKING_LIMIT.get(dim, 0.2):
+        pos = _rejection(num_particles, lower, upper, radius, rng, max_idle_rounds)
+        if pos is not None:
+            return pos
+    return lattice_placement(num_particles, lower, upper, radius, rng)
+
+
+def _neighbour_offsets(dim, cell, radius):
+    # Cell offsets that can hold a centre within 2r of a point in the middle
+    # cell, nearest first so most conflicts are found in the first few
+    reach = int(math.ceil(2 * radius / cell))
+    offsets = []
+    for offset in itertools.product(range(-reach, reach + 1), repeat=dim):
+        gap = sum((max(abs(o) - 1, 0) * cell) ** 2 for o in offset)
+        if gap < (2 * radius) ** 2:
+            offsets.append(offset)
+    offsets.sort(key=lambda offset: sum(o * o for o in offset))
+    return reach, np.array(offsets, dtype=np.int64)
+
+
+def _sorted_lookup(keys, owners):
+    # Owner of each cell key from a sorted key array, -1 for empty cells
+    def owner_of(key):
+        if len(keys) == 0:
+            return np.full(len(key), -1, dtype=np.int64)
+        slot = np.minimum(np.searchsorted(keys, key), len(keys) - 1)
+        return np.where(keys[slot] == key, owners[slot], -1)
+    return owner_of
+
+
+def _conflicts(candidates, keys, points, owner_of, steps, radius, before=None):
+    # Whether each candidate (in the cell with linear key keys[i]) is within
+    # 2r of one of `points`, found through owner_of(cell key); with `before`,
+    # only points of a lower index than before[i] count. Candidates drop
+    # out at their first conflict
+    conflict = np.zeros(len(candidates), dtype=bool)
+    if len(points) == 0:
+        return conflict
+    alive = np.arange(len(candidates))
+    diameter_sq = 4 * radius * radius
+    for step in steps:
+        if len(alive) == 0:
+            break
+        other = owner_of(keys[alive] + step)
+        found = other >= 0
+        if before is not None:
+            found &= other < before[alive]
+        d = candidates[alive] - points[other]
+        hit = found & (np.einsum('ij,ij->i', d, d) <= diameter_sq)
+        conflict[alive[hit]] = True
+        alive = alive[~hit]
+    return conflict
+
+
+def _rejection(num_particles, lower, upper, radius, rng, max_idle_rounds):
+    dim = len(lower)
+    extent = upper - lower
+    cell = 2 * radius / math.sqrt(dim)
+    shape = np.maximum(np.ceil(extent / cell), 1).astype(np.int64)
+    reach, offsets = _neighbour_offsets(dim, cell, radius)
+
+    # Cells are numbered in a grid padded by `reach` empty cells on every
+    # side, so a neighbour is always the own key plus a fixed step
+    padded = tuple(shape + 2 * reach)
+    strides = np.cumprod((padded[1:] + (1,))[::-1])[::-1]
+    steps = offsets @ strides
+
+    # Owner of every cell: a dense grid when it fits in memory, sorted keys
+    # (memory following the particles) for very sparse boxes
+    num_cells = np.prod(np.array(padded, dtype=float))
+    grid = None
+    if num_cells <= max(64 * num_particles, 1 << 25):
+        grid = np.full(int(num_cells), -1, dtype=np.int64)
+    keys = np.empty(0, dtype=np.int64)
+    owners = np.empty(0, dtype=np.int64)
+
+    pos = np.empty((0, dim))
+    acceptance = 1.0
+    idle = 0
+    while len(pos) < num_particles:
+        # Draw about enough candidates for what is left at the last acceptance rate
+        need = num_particles - len(pos)
+        batch = int(min(max(1.2 * need / max(acceptance, 1e-3), 1024), 1 << 21))
+        candidates = lower + extent * rng.random((batch, dim))
+        cells = np.minimum(((candidates - lower) / cell).astype(np.int64), shape - 1)
+        cell_keys = (cells + reach) @ strides
+
+        # Against the particles already placed
+        owner_of = grid.__getitem__ if grid is not None else _sorted_lookup(keys, owners)
+        keep = ~_conflicts(candidates, cell_keys, pos, owner_of, steps, radius)
+        candidates, cell_keys = candidates[keep], cell_keys[keep]
+
+        # Against each other: one per cell, and none within 2r of an earlier candidate
+        _, first = np.unique(cell_keys, return_index=True)
+        first.sort()
+        candidates, cell_keys = candidates[first], cell_keys[first]
+        order = np.argsort(cell_keys)
+        keep = ~_conflicts(candidates, cell_keys, candidates, _sorted_lookup(cell_keys[order], order),
+                           steps, radius, before=np.arange(len(candidates)))
+        accepted = candidates[keep][:need]
+        acceptance = len(accepted) / batch
+
+        if len(accepted) == 0:
+            idle += 1
+            if idle >= max_idle_rounds:
+                return None
+            continue
+        idle = 0
+        new_keys = cell_keys[keep][:need]
+        new_owners = np.arange(len(pos), len(pos) + len(accepted))
+        if grid is not None:
+            grid[new_keys] = new_owners
+        else:
+            keys = np.concatenate([keys, new_keys])
+            owners = np.concatenate([owners, new_owners])
+            order = np.argsort(keys, kind='stable')
+            keys, owners = keys[order], owners[order]
+        pos = np.concatenate([pos, accepted])
+    return pos
+
+
+def lattice_placement(num_particles, lower, upper, radius, rng):
+    """Centres on a random subset of grid sites at least a diameter apart, each jittered in its slot."""
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    extent = upper - lower
+    sites = np.floor(extent / (2 * radius)).astype(np.int64) + 1
+    if np.prod(sites.astype(float)) < num_particles:
+        raise ValueError(f"{num_particles} particles of radius {radius} do not fit in the box "
+                         f"{lower.tolist()} .. {upper.tolist()} (at most {int(np.prod(sites))} on a lattice)")
+    spacing = np.where(sites > 1, extent / np.maximum(sites - 1, 1), 0.0)
+    # Each particle may move within its own slot; a single site per axis
+    # can go anywhere along it
+    jitter = np.where(sites > 1, (spacing - 2 * radius) / 2, extent / 2)
+    origin = np.where(sites > 1, lower, lower + extent / 2)
+
+    chosen = rng.choice(int(np.prod(sites)), num_particles, replace=False)
+    index = np.stack(np.unravel_index(chosen, tuple(sites)), axis=1)
+    pos = origin + index * spacing + rng.uniform(-1, 1, (num_particles, len(lower))) * jitter
+    return np.clip(pos, lower, upper)
@@ -0,0 +1,225 @@
+"""Accuracy and speed of every engine variant against the exact event-driven engine.
+
+    python regression.py [--particles 500] [--dim 3] [--radius 0.03] [--until 10] [--samples 10]
+                         [--dt 0.01] [--variants jit parallel] [--out regression.json]
+
+The reference is ``EventDrivenSimulation``, the port of
+Microgravity-simulation-0.1: elastic walls and equal-mass elastic
+collisions, solved event by event. Every variant starts from its initial
+state -- the same positions and velocities, in the same box, without
+gravity -- and runs to the same sample times. At each sample the report
+holds the relative energy drift, the momentum error and the trajectory
+divergence from the reference, and the wall and particle collision counts
+next to the reference ones. A time-stepped collision is a pair that starts
+touching in a step. Throughput comes with them: steps (or events) per
+second and simulated seconds per second, so every performance mode comes
+with its measured accuracy cost. Variants on the numba backend are skipped,
+with a note in the report, when numba is not installed.
+
+Hard-sphere trajectories are chaotic, so any two engines part ways after a
+few collisions per particle; ``diverged_at`` is the first sample where the
+RMS position error exceeds a particle radius.
+"""
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+
+from event_driven import EventDrivenSimulation
+from kernels import get_backend
+from parallel import SlabDecomposition
+from simulation import Simulation
+
+# Engine variants: event-driven ones by their options, time-stepped ones by
+# their Simulation arguments ('parallel' gets its SlabDecomposition per run)
+VARIANTS = {
+    'event_all_pairs': dict(use_cells=False),
+    'scalar': dict(backend='numpy', collision_mode='sequential'),
+    'vectorized': dict(backend='numpy', collision_mode='batch'),
+    'jit': dict(backend='numba', collision_mode='sequential'),
+    'jit_batch': dict(backend='numba', collision_mode='batch'),
+    'adaptive': dict(backend='numba', collision_mode='sequential', adaptive=True),
+    'parallel': dict(backend='numba', collision_mode='batch', parallel=True),
+}
+EVENT_VARIANTS = ('event_all_pairs',)
+
+
+def reference(num_particles=500, dim=3, box_size=1.0, particle_radius=0.03, max_speed=0.1, seed=0,
+              use_cells=None):
+    """The event-driven reference run (and the initial state of every variant)."""
+    return EventDrivenSimulation(num_particles=num_particles, box_size=box_size,
+                                 particle_radius=particle_radius, max_speed=max_speed, dim=dim,
+                                 use_cells=use_cells, seed=seed)
+
+
+def time_stepped(ref, dt, parallel=False, **options):
+    """A ``Simulation`` in the state of ``ref``: same box and particles, unit masses, no gravity."""
+    box = ref.box_size
+    sim = Simulation(num_particles=ref.num_particles, dim=ref.dim, tube_width=box,
+                     tube_depth=box if ref.dim == 3 else None, tube_height=box,
+                     particle_radius=ref.particle_radius, particle_mass=1.0, gravity=0.0, start_time=0.0,
+                     dt=dt, wall_restitution=1.0, particle_restitution=1.0, overlap_free=False,
+                     parallel=SlabDecomposition() if parallel else None, **options)
+    sim.pos[:] = ref.positions()
+    sim.vel[:] = ref.vel
+    return sim
+
+
+class _CollisionCounter:
+    # Step hooks (see instrumentation.py) counting the pairs that start
+    # touching, and the time spent doing so
+    def __init__(self):
+        self.collisions = 0
+        self.seconds = 0.0
+        self._touching = np.empty(0, dtype=np.int64)
+
+    def begin_step(self, sim):
+        pass
+
+    def before_contacts(self, sim):
+        pass
+
+    def end_step(self, sim):
+        start = time.perf_counter()
+        if sim.contacts is not None:
+            i_idx, j_idx = sim.contacts
+            # One key per unordered pair, whichever way round it is reported
+            low, high = np.minimum(i_idx, j_idx), np.maximum(i_idx, j_idx)
+            touching = np.unique(low.astype(np.int64) * sim.num_particles + high)
+            self.collisions += len(np.setdiff1d(touching, self._touching, assume_unique=True))
+            self._touching = touching
+        self.seconds += time.perf_counter() - start
+
+
+def _snapshot(engine):
+    if isinstance(engine, EventDrivenSimulation):
+        return {'pos': engine.positions(), 'vel': engine.vel.copy(), 'updates': engine.wall_collisions
+                + engine.particle_collisions + engine.cell_crossings,
+                'wall_collisions': engine.wall_collisions, 'particle_collisions': engine.particle_collisions}
+    return {'pos': engine.pos.astype(float), 'vel': engine.vel.astype(float), 'updates': engine.steps,
+            'wall_collisions': int(engine.wall_hits), 'particle_collisions': engine.instruments.collisions}
+
+
+def _advance(engine, until):
+    # Run to ``until``; returns the wall-clock seconds spent in the engine
+    start = time.perf_counter()
+    if isinstance(engine, EventDrivenSimulation):
+        engine.run(until)
+        return time.perf_counter() - start
+    hooks = engine.instruments.seconds
+    # Fixed steps stop at the step closest to ``until``, adaptive ones land on it
+    engine.run(until if engine.adaptive else until - engine.dt / 2)
+    return time.perf_counter() - start - (engine.instruments.seconds - hooks)
+
+
+def _compare(snapshot, expected, initial_energy, radius):
+    energy = 0.5 * float(np.einsum('ij,ij->', snapshot['vel'], snapshot['vel']))
+    error = np.linalg.norm(snapshot['pos'] - expected['pos'], axis=1)
+    return {
+        'energy_drift': (energy - initial_energy) / initial_energy,
+        'momentum_error': float(np.linalg.norm(snapshot['vel'].sum(axis=0) - expected['vel'].sum(axis=0))),
+        'rms_divergence': float(np.sqrt(np.mean(error**2))),
+        'max_divergence': float(error.max(initial=0.0)),
+        'diverged_particles': int((error > radius).sum()),
+        'wall_collisions': snapshot['wall_collisions'],
+        'particle_collisions': snapshot['particle_collisions'],
+    }
+
+
+def run_regression(variants=tuple(VARIANTS), num_particles=500, dim=3, box_size=1.0, particle_radius=0.03,
+                   max_speed=0.1, until=10.0, samples=10, dt=0.01, seed=0, report=print):
+    """Run the reference and every variant; returns a JSON-ready record of all samples."""
+    setup = dict(num_particles=num_particles, dim=dim, box_size=box_size, particle_radius=particle_radius,
+                 max_speed=max_speed, seed=seed)
+    times = [until * (k + 1) / samples for k in range(samples)]
+
+    # The reference trajectory at every sample time
+    ref = reference(**setup)
+    initial = _snapshot(ref)
+    initial_energy = 0.5 * float(np.einsum('ij,ij->', initial['vel'], initial['vel']))
+    engines = {'event_driven': ref}
+    skipped = {}
+    for name in variants:
+        if name in EVENT_VARIANTS:
+            engines[name] = reference(**setup, **VARIANTS[name])
+        else:
+            try:
+                get_backend(VARIANTS[name].get('backend'))
+            except ImportError as error:
+                skipped[name] = str(error)
+                continue
+            # One untimed step so JIT compilation stays out of the measurement
+            warm_up = time_stepped(ref, dt, **VARIANTS[name])
+            warm_up.step()
+            if warm_up.parallel is not None:
+                warm_up.parallel.shutdown()
+            engines[name] = time_stepped(ref, dt, **VARIANTS[name])
+            engines[name].instruments = _CollisionCounter()
+
+    results = {name: {'samples': [], 'seconds': 0.0} for name in engines}
+    expected = None
+    for t in times:
+        for name, engine in engines.items():
+            seconds = _advance(engine, t)
+            snapshot = _snapshot(engine)
+            if name == 'event_driven':
+                expected = snapshot
+            record = results[name]
+            record['seconds'] += seconds
+            record['samples'].append({'time': t, **_compare(snapshot, expected, initial_energy, particle_radius)})
+            record['updates'] = snapshot['updates']
+
+    for engine in engines.values():
+        if getattr(engine, 'parallel', None) is not None:
+            engine.parallel.shutdown()
+
+    report(f"{'engine':<16}{'energy drift':>14}{'momentum err':>14}{'walls':>8}{'pairs':>8}"
+           f"{'rms div':>10}{'diverged at':>13}{'updates/s':>12}{'sim s/s':>10}")
+    for name, record in results.items():
+        last = record['samples'][-1]
+        diverged = [s['time'] for s in record['samples'] if s['rms_divergence'] > particle_radius]
+        record['diverged_at'] = diverged[0] if diverged else None
+        record['updates_per_sec'] = record['updates'] / record['seconds'] if record['seconds'] else None
+        record['sim_seconds_per_sec'] = until / record['seconds'] if record['seconds'] else None
+        report(f"{name:<16}{last['energy_drift']:>14.2e}{last['momentum_error']:>14.2e}"
+               f"{last['wall_collisions']:>8}{last['particle_collisions']:>8}{last['rms_divergence']:>10.3g}"
+               f"{'-' if record['diverged_at'] is None else format(record['diverged_at'], '.3g'):>13}"
+               f"{record['updates_per_sec'] or 0:>12.1f}{record['sim_seconds_per_sec'] or 0:>10.2f}")
+    for name, reason in skipped.items():
+        report(f"{name:<16}skipped: {reason}")
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'setup': {**setup, 'until': until, 'dt': dt},
+        'engines': results,
+        'skipped': skipped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument('--particles', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=3, choices=(2, 3))
+    parser.add_argument('--box', type=float, default=1.0, help='side of the box (m)')
+    parser.add_argument('--radius', type=float, default=0.03)
+    parser.add_argument('--speed', type=float, default=0.1, help='largest initial velocity component (m/s)')
+    parser.add_argument('--until', type=float, default=10.0)
+    parser.add_argument('--samples', type=int, default=10)
+    parser.add_argument('--dt', type=float, default=0.01, help='step of the time-stepped variants')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='regression.json')
+    args = parser.parse_args(argv)
+
+    result = run_regression(args.variants, args.particles, args.dim, args.box, args.radius, args.speed,
+                            args.until, args.samples, args.dt, args.seed)
+    with open(args.out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Scenario files: a chamber, its gravity schedule and its particles as TOML or JSON.
+
+A scenario is a document with up to four tables, every key optional (the
+``Simulation`` defaults apply to the missing ones)::
+
+    description = "prototype05: colliding particles, gravity off after 1 s"
+
+    [chamber]
+    width = 50.0             # tube_width, cm
+    height = 25.0            # tube_height, cm
+    wall_restitution = 0.8
+
+    [schedule]
+    model = "switch_off"     # gravity_model
+    gravity = 980.0
+    start_time = 1.0
+    simulation_time = 10.0
+    dt = 0.01
+
+    [particles]
+    count = 50               # num_particles
+    radius = 0.9
+    mass = 100.0
+    restitution = 0.2        # particle_restitution
+
+    [engine]
+    collision_mode = "batch"
+
+Mixed payloads list their particle sets instead of ``count``, ``radius``
+and ``mass``, as ``[[particles.sets]]`` tables with those three keys; the
+simulation then gets per-particle radii and masses. ``KEYS`` lists every
+key and the ``Simulation`` argument it sets. The files in ``scenarios/``
+are the prototypes, ``simulation.PRESETS`` is loaded from them.
+
+This module only reads files, so loading a scenario stays cheap.
+"""
+import json
+import os
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+SUFFIXES = ('.toml', '.json')
+
+# Scenario key of every table -> Simulation argument
+KEYS = {
+    'chamber': {'dim': 'dim', 'width': 'tube_width', 'depth': 'tube_depth', 'height': 'tube_height',
+                'top_wall': 'top_wall', 'wall_restitution': 'wall_restitution', 'coupled': 'coupled',
+                'mass': 'mass_aga', 'frontal_area': 'frontal_area'},
+    'schedule': {'model': 'gravity_model', 'gravity': 'gravity', 'start_time': 'start_time',
+                 'simulation_time': 'simulation_time', 'dt': 'dt', 'drag_coefficient': 'drag_coefficient',
+                 'air_density': 'air_density'},
+    'particles': {'count': 'num_particles', 'radius': 'particle_radius', 'mass': 'particle_mass',
+                  'restitution': 'particle_restitution', 'spawn_height': 'spawn_height',
+                  'initial_speed': 'initial_speed', 'overlap_free': 'overlap_free'},
+    'engine': {'collision_mode': 'collision_mode', 'backend': 'backend', 'adaptive': 'adaptive',
+               'min_dt': 'min_dt', 'max_dt': 'max_dt', 'courant': 'courant', 'dtype': 'dtype',
+               'sleep_speed': 'sleep_speed', 'sleep_steps': 'sleep_steps'},
+}
+SET_KEYS = ('count', 'radius', 'mass')
+
+
+def scenario_path(name):
+    """The file of scenario ``name``: an existing path, or a file in ``SCENARIO_DIR``."""
+    if os.path.isfile(name):
+        return name
+    for suffix in SUFFIXES:
+        path = os.path.join(SCENARIO_DIR, name + suffix)
+        if os.path.isfile(path):
+            return path
+    raise KeyError(f"unknown scenario {name!r}, expected a file or one of {scenario_names()}")
+
+
+def scenario_names():
+    """Names of the scenarios in ``SCENARIO_DIR``, sorted."""
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(SCENARIO_DIR)
+                  if os.path.splitext(f)[1] in SUFFIXES)
+
+
+def load_scenario(name):
+    """The scenario document of ``name`` (see ``scenario_path``) as a dict."""
+    path = scenario_path(name)
+    if path.endswith('.toml'):
+        import tomllib
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+
+def simulation_kwargs(scenario):
+    """``Simulation`` keyword arguments for a scenario document."""
+    kwargs = {}
+    for table, values in scenario.items():
+        if table == 'description':
+            continue
+        if table not in KEYS:
+            raise ValueError(f"unknown scenario table {table!r}, expected one of {sorted(KEYS)}")
+        for key, value in values.items():
+            if table == 'particles' and key == 'sets':
+                continue
+            if key not in KEYS[table]:
+                raise ValueError(f"unknown key {key!r} in [{table}], expected one of {sorted(KEYS[table])}")
+            kwargs[KEYS[table][key]] = tuple(value) if key == 'spawn_height' else value
+
+    sets = scenario.get('particles', {}).get('sets')
+    if sets is not None:
+        given = [key for key in SET_KEYS if key in scenario['particles']]
+        if given:
+            raise ValueError(f"[particles] has both sets and {given}")
+        for particle_set in sets:
+            if sorted(particle_set) != sorted(SET_KEYS):
+                raise ValueError(f"a particle set needs exactly {SET_KEYS}, got {sorted(particle_set)}")
+        kwargs['num_particles'] = sum(s['count'] for s in sets)
+        kwargs['particle_radius'] = [s['radius'] for s in sets for _ in range(s['count'])]
+        kwargs['particle_mass'] = [s['mass'] for s in sets for _ in range(s['count'])]
+    return kwargs
+
+
+def load_presets():
+    """``simulation_kwargs`` of every scenario in ``SCENARIO_DIR``, by name."""
+    return {name: simulation_kwargs(load_scenario(name)) for name in scenario_names()}
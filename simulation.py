@@ -0,0 +1,625 @@
+import warnings
+
+import numpy as np
+
+from chamber import CHAMBER_MODELS, chamber_model, integrate
+from collisions import (active_pairs, contact_distance, grid_pairs, overlapping_pairs, pair_distance,
+                        resolve_batch, resolve_batch_polydisperse)
+from kernels import get_backend
+from placement import place_particles
+from scenario import load_presets, load_scenario, simulation_kwargs
+
+# Attributes that make up the state of a Simulation, see state_dict()
+STATE_SCALARS = ('num_particles', 'dim', 'tube_width', 'tube_depth', 'tube_height', 'particle_radius',
+                 'particle_mass', 'polydisperse', 'dtype', 'wall_restitution', 'particle_restitution',
+                 'collision_mode', 'top_wall', 'gravity', 'gravity_model', 'start_time',
+                 'simulation_time', 'dt', 'adaptive', 'min_dt', 'max_dt', 'courant', 'drag_coefficient',
+                 'air_density', 'mass_aga', 'frontal_area', 'coupled', 'time', 'steps', 'wall_hits',
+                 'pair_checks', 'pair_hits', 'is_free_fall', 'free_fall_started_at', 'velocity_chamber',
+                 'g_eff', 'free_fall_steps', 'sleep_speed', 'sleep_steps', 'last_accel')
+STATE_ARRAYS = ('pos', 'vel', 'recoil', 'residual_accel', 'asleep', 'calm_steps')
+
+# Gravity schedules used by the prototype iterations
+#   'anti_gravity' - prototype01: nothing before start_time, then gravity pushes upward
+#   'chamber'      - prototype02: chamber and particles accelerate together after start_time
+#   'drag'         - protoypr03: full gravity before start_time, drag-limited g_eff after
+#   'switch_off'   - prototype04/05: full gravity before start_time, zero after
+GRAVITY_MODELS = ('anti_gravity', 'chamber', 'drag', 'switch_off')
+
+# Parameter sets reproducing each prototype script, from scenarios/*.toml
+PRESETS = load_presets()
+
+# Without particle collisions an adaptive step only bounds how far gravity
+# bends a path: by at most GRAVITY_SAG times the `courant` displacement
+GRAVITY_SAG = 4
+
+
+class Simulation:
+    """Headless, render-free particle chamber.
+
+    Particle state lives in two contiguous ``(num_particles, dim)`` arrays,
+    ``pos`` and ``vel``, with the last axis pointing up for both. (The
+    prototypes stored ``vy`` positive downward; the physics is the same.)
+    ``dim=2`` is the prototypes' ``tube_width`` x ``tube_height`` chamber;
+    ``dim=3`` adds ``tube_depth`` (by default the width) as the middle axis,
+    and gravity still acts along the last one. Advance the
+    state with ``step(n)`` or ``run(until)``; nothing here imports matplotlib,
+    see ``viewer.py`` for the optional animation.
+
+    ``backend`` selects the kernels of the hot loops (see ``kernels.py``);
+    every backend gives identical results, in ``float64`` and ``float32``.
+
+    With ``adaptive=True`` every step picks its own ``dt`` between ``min_dt``
+    and ``max_dt`` (by default ``dt / 100`` and ``10 * dt``): large steps
+    while the particles drift slowly, short ones around impacts on walls
+    and between particles (see ``_choose_dt``). The displacement limit of
+    ``courant`` radii per step only applies with particle collisions on.
+
+    With ``coupled=True`` the chamber is a body of mass ``mass_aga`` during
+    free fall: every wall impact exchanges momentum with it, and since
+    ``vel`` is measured in the chamber frame, the chamber's recoil shifts
+    every particle's velocity. ``recoil`` accumulates the chamber velocity
+    picked up from impacts and ``residual_accel`` holds the last step's
+    share, the residual acceleration caused by payload rattle (``g_eff``
+    still reports gravity and drag only).
+
+    ``particle_radius`` and ``particle_mass`` may be ``(num_particles,)``
+    arrays for mixed payloads; the simulation is then ``polydisperse`` and
+    keeps both as per-particle arrays next to ``pos`` and ``vel``. The grid
+    broad phase uses the largest radius for its cells and contacts exchange
+    the reduced-mass impulse. With scalars (the prototypes) the original
+    equal-particle kernels run unchanged. ``dtype='float32'`` halves the
+    memory of all per-particle arrays.
+
+    With ``overlap_free`` (the default whenever ``particle_restitution`` is
+    set) the particles start at least a diameter apart inside the spawn
+    band, see ``placement.place_particles``; otherwise positions are drawn
+    uniformly and may overlap, as in the prototypes. A spawn band too
+    crowded for the default falls back to the uniform draw with a warning;
+    an explicit ``overlap_free=True`` raises instead.
+
+    ``parallel`` (a ``parallel.SlabDecomposition``) steps a large batch-mode
+    chamber on a thread pool, in slabs along the first axis.
+
+    With ``sleep_speed`` set, particles settled under gravity go to sleep:
+    a particle slower than ``sleep_speed`` for ``sleep_steps`` steps in a
+    row, resting on the floor or on sleeping particles and touching no
+    moving one, stops and is left out of integration, wall handling and
+    the broad phase (see ``_update_sleep``). Speeds are measured net of
+    the ``gravity * dt`` each step adds, so 5 cm/s is a good threshold
+    whatever the step. A contact that gives a sleeper more than that
+    wakes it, and a change of the gravity schedule, e.g. the free-fall
+    switch, wakes everyone.
+    """
+
+    def __init__(self, num_particles=50, tube_width=50.0, tube_height=25.0, particle_radius=0.9,
+                 gravity=980.0, start_time=1.0, simulation_time=10.0, dt=0.01,
+                 wall_restitution=0.8, particle_restitution=None, particle_mass=100.0,
+                 gravity_model='switch_off', top_wall=True, drag_coefficient=0.5,
+                 air_density=0.0012, mass_aga=500.0, frontal_area=50.0, spawn_height=None,
+                 initial_speed=5.0, collision_mode='sequential', backend=None, adaptive=False,
+                 min_dt=None, max_dt=None, courant=0.5, coupled=False, instruments=None,
+                 overlap_free=None, dtype='float64', dim=2, tube_depth=None, parallel=None,
+                 sleep_speed=None, sleep_steps=10, seed=None):
+        if gravity_model not in GRAVITY_MODELS:
+            raise ValueError(f"unknown gravity_model {gravity_model!r}, expected one of {GRAVITY_MODELS}")
+        if collision_mode not in ('sequential', 'batch'):
+            raise ValueError(f"unknown collision_mode {collision_mode!r}, expected 'sequential' or 'batch'")
+        if dim not in (2, 3):
+            raise ValueError(f"dim must be 2 or 3, got {dim!r}")
+        if parallel is not None and collision_mode != 'batch':
+            raise ValueError("parallel stepping needs collision_mode='batch'")
+        if parallel is not None and sleep_speed is not None:
+            raise ValueError("parallel stepping does not support sleeping particles")
+
+        # Chamber and particle parameters
+        self.num_particles = num_particles
+        self.dim = dim
+        self.tube_width = tube_width                  # Chamber width in cm
+        self.tube_depth = None if dim == 2 else (tube_width if tube_depth is None else tube_depth)
+        self.tube_height = tube_height                # Chamber height in cm
+        self.box = self._box()
+        self.dtype = np.dtype(dtype).name             # Storage of the per-particle arrays
+        # Identical particles keep scalars (the fast path); mixed ones get
+        # one array per property
+        self.polydisperse = np.ndim(particle_radius) > 0 or np.ndim(particle_mass) > 0
+        if self.polydisperse:
+            particle_radius = np.broadcast_to(np.asarray(particle_radius, dtype=self.dtype), (num_particles,)).copy()
+            particle_mass = np.broadcast_to(np.asarray(particle_mass, dtype=self.dtype), (num_particles,)).copy()
+        self.particle_radius = particle_radius        # Particle radius in cm
+        self.particle_mass = particle_mass            # Mass of each particle in grams
+        self.wall_restitution = wall_restitution      # Bounce energy loss coefficient for walls
+        self.particle_restitution = particle_restitution  # None disables particle-particle collisions
+        self.collision_mode = collision_mode
+        self.top_wall = top_wall
+        self.kernels = get_backend(backend)
+
+        # Gravity schedule
+        self.gravity = gravity                        # Gravity acceleration (cm/s²)
+        self.gravity_model = gravity_model
+        self.start_time = start_time                  # Time when free fall begins (seconds)
+        self.simulation_time = simulation_time        # Default end time for run()
+        self.dt = dt                                  # Time step (seconds), the last one if adaptive
+        self.adaptive = adaptive
+        self.min_dt = dt / 100 if min_dt is None else min_dt
+        self.max_dt = dt * 10 if max_dt is None else max_dt
+        self.courant = courant                        # Max displacement per step, in radii
+        self.drag_coefficient = drag_coefficient
+        self.air_density = air_density                # Air density in g/cm³
+        self.mass_aga = mass_aga                      # Mass of the AGA in grams
+        self.frontal_area = frontal_area              # Cross-sectional area in cm²
+        self.coupled = coupled                        # Wall impacts push the chamber back
+        self.instruments = instruments                # Step hooks, see instrumentation.py
+        self.parallel = parallel                      # Thread pool and slabs, see parallel.py
+        self.sleep_speed = sleep_speed                # None keeps every particle awake
+        self.sleep_steps = sleep_steps                # Calm steps before a particle sleeps
+
+        # Initialize particle positions and velocities
+        self.rng = np.random.default_rng(seed)
+        r = self.max_radius
+        if spawn_height is None:
+            # Start particles near the top (prototype04/05)
+            spawn_height = (tube_height - r - 5, tube_height - r)
+        required = overlap_free is not None
+        if overlap_free is None:
+            # Interpenetrating particles only matter when they collide
+            overlap_free = particle_restitution is not None
+        # Anywhere across the chamber, within the spawn band vertically
+        lower = [r] * (dim - 1) + [spawn_height[0]]
+        upper = [extent - r for extent in self.box[:-1].tolist()] + [spawn_height[1]]
+        self.pos = np.empty((num_particles, dim), dtype=self.dtype)
+        self.vel = np.empty((num_particles, dim), dtype=self.dtype)
+        if overlap_free:
+            state = self.rng.bit_generator.state
+            try:
+                # Mixed sizes are spaced for the largest one
+                self.pos[:] = place_particles(num_particles, lower, upper, r, self.rng)
+            except ValueError as error:
+                if required:
+                    raise
+                # Too crowded for the default: the uniform draw of the prototypes
+                warnings.warn(f"{error}; drawing positions uniformly, particles may overlap")
+                self.rng.bit_generator.state = state
+                overlap_free = False
+        if not overlap_free:
+            for axis in range(dim):
+                self.pos[:, axis] = self.rng.uniform(lower[axis], upper[axis], num_particles)
+        for axis in range(dim):
+            self.vel[:, axis] = self.rng.uniform(-initial_speed, initial_speed, num_particles)
+
+        # Simulation state
+        self.time = 0.0
+        self.steps = 0
+        self.wall_hits = 0
+        self.pair_checks = 0
+        self.pair_hits = 0
+        self.is_free_fall = False
+        self.free_fall_started_at = None
+        self.velocity_chamber = 0.0
+        self.g_eff = 0.0 if gravity_model in ('anti_gravity', 'chamber') else gravity
+        self.free_fall_steps = 0
+        self.recoil = np.zeros(dim)                   # Chamber velocity change from impacts (cm/s, up)
+        self.residual_accel = np.zeros(dim)           # Chamber acceleration from impacts, last step
+        self.asleep = np.zeros(num_particles, dtype=bool)
+        self.calm_steps = np.zeros(num_particles, dtype=np.int64)  # Consecutive calm steps
+        self.last_accel = None                        # Gravity of the last step, to detect changes
+        self.contacts = None                          # Touching pairs (i_idx, j_idx) of the last step
+
+        # Free-fall chamber dynamics, shared by every run with the same parameters
+        self.chamber = None
+        if gravity_model in CHAMBER_MODELS:
+            self.chamber = chamber_model(gravity_model, gravity, dt, drag_coefficient, air_density,
+                                         mass_aga, frontal_area)
+
+    @classmethod
+    def from_preset(cls, name, **overrides):
+        """Build the simulation of one of the prototype scripts (see ``PRESETS``)."""
+        if name not in PRESETS:
+            raise KeyError(f"unknown preset {name!r}, expected one of {sorted(PRESETS)}")
+        return cls(**{**PRESETS[name], **overrides})
+
+    @classmethod
+    def from_scenario(cls, name, **overrides):
+        """Build the simulation described by a scenario file (see ``scenario.py``)."""
+        return cls(**{**simulation_kwargs(load_scenario(name)), **overrides})
+
+    def state_dict(self):
+        """Everything needed to continue this run exactly: parameters, particles, counters, RNG.
+
+        Scalars are plain Python values and the RNG state is a dict, so the
+        result can be stored as JSON plus arrays (see ``checkpoint.py``).
+        The ``instruments`` and ``parallel`` are not part of the state.
+        """
+        state = {name: getattr(self, name) for name in STATE_SCALARS}
+        # NumPy scalars (e.g. counters summed from arrays) as plain Python values
+        state = {name: value.item() if isinstance(value, np.generic) else value
+                 for name, value in state.items()}
+        # Per-particle radii and masses of a polydisperse run are arrays
+        state = {name: value.copy() if isinstance(value, np.ndarray) else value
+                 for name, value in state.items()}
+        state.update({name: getattr(self, name).copy() for name in STATE_ARRAYS})
+        state['backend'] = self.kernels.name
+        state['chamber_dt'] = self.chamber.dt if self.chamber is not None else None
+        state['rng'] = self.rng.bit_generator.state
+        return state
+
+    def load_state_dict(self, state):
+        """Restore the state saved by ``state_dict``, replacing this simulation's."""
+        for name in STATE_SCALARS:
+            setattr(self, name, state[name])
+        self.box = self._box()
+        for name in STATE_ARRAYS:
+            setattr(self, name, np.array(state[name], dtype=self.dtype if name in ('pos', 'vel') else None))
+        self.kernels = get_backend(state['backend'])
+        self.chamber = None
+        if self.gravity_model in CHAMBER_MODELS:
+            self.chamber = chamber_model(self.gravity_model, self.gravity, state['chamber_dt'],
+                                         self.drag_coefficient, self.air_density, self.mass_aga,
+                                         self.frontal_area)
+        self.rng = np.random.default_rng()
+        self.rng.bit_generator.state = state['rng']
+        if not hasattr(self, 'instruments'):
+            self.instruments = None
+        if not hasattr(self, 'parallel'):
+            self.parallel = None
+        self.contacts = None
+
+    @classmethod
+    def from_state_dict(cls, state):
+        """A simulation restored from ``state_dict`` without running ``__init__``."""
+        sim = cls.__new__(cls)
+        sim.load_state_dict(state)
+        return sim
+
+    def _box(self):
+        # Upper corner of the chamber per axis, the vertical axis last
+        if self.dim == 2:
+            return np.array([self.tube_width, self.tube_height], dtype=float)
+        return np.array([self.tube_width, self.tube_depth, self.tube_height], dtype=float)
+
+    @property
+    def max_radius(self):
+        """The radius of the largest particle."""
+        return float(np.max(self.particle_radius)) if self.polydisperse else self.particle_radius
+
+    def kinetic_energy(self):
+        """Total kinetic energy of the particles (erg)."""
+        if self.polydisperse:
+            return 0.5 * float(np.einsum('i,ij,ij->', self.particle_mass, self.vel, self.vel, dtype=float))
+        return 0.5 * self.particle_mass * float(np.einsum('ij,ij->', self.vel, self.vel, dtype=float))
+
+    def momentum(self):
+        """Total momentum of the particles, shape (dim,)."""
+        if self.polydisperse:
+            return np.einsum('i,ij->j', self.particle_mass, self.vel, dtype=float)
+        return self.particle_mass * self.vel.sum(axis=0, dtype=float)
+
+    def _gravity_step(self):
+        # Advance the gravity schedule by one step and return the downward
+        # acceleration applied to the particles during it
+        dt = self.dt
+        if self.gravity_model == 'switch_off':
+            self.g_eff = 0.0 if self.is_free_fall else self.gravity
+            return self.g_eff
+        if self.gravity_model == 'anti_gravity':
+            self.g_eff = -self.gravity if self.is_free_fall else 0.0
+            return self.g_eff
+        if not self.is_free_fall:
+            # Chamber at rest before the switch
+            if self.gravity_model == 'chamber':
+                self.g_eff = max(self.gravity, 0)
+                return 0.0
+            self.g_eff = self.gravity
+            self.velocity_chamber = 0.0
+            return self.g_eff
+        # 'chamber' and 'drag' in free fall read the cached chamber curve:
+        # by step index with a fixed dt, interpolated in time if adaptive.
+        # Impacts change a coupled chamber's velocity, and with it the
+        # drag, so it is integrated step by step instead
+        if self.coupled:
+            accel, g_eff, velocity = integrate(self.gravity_model, self.gravity, dt,
+                                               self.chamber.drag_factor, self.mass_aga,
+                                               self.velocity_chamber, 1)
+            accel, self.g_eff, self.velocity_chamber = accel.item(), g_eff.item(), velocity.item()
+        elif self.adaptive:
+            since = self.time - self.free_fall_started_at
+            accel, self.g_eff, _ = (float(a) for a in self.chamber.at(since))
+            self.velocity_chamber = float(self.chamber.at(since + dt)[2])
+        else:
+            accel, self.g_eff, self.velocity_chamber = self.chamber.row(self.free_fall_steps)
+        self.free_fall_steps += 1
+        return accel
+
+    def _handle_walls(self):
+        if self.coupled and self.is_free_fall:
+            self._handle_walls_coupled()
+            return
+        if self.parallel is not None:
+            self.wall_hits += self.parallel.reflect_walls(self)
+            return
+        reflect = self.kernels.reflect_walls_polydisperse if self.polydisperse else self.kernels.reflect_walls
+        awake = self._awake()
+        if awake is None:
+            self.wall_hits += reflect(self.pos, self.vel, self.box, self.particle_radius,
+                                      self.wall_restitution, self.top_wall)
+            return
+        pos, vel = self.pos[awake], self.vel[awake]
+        r = self.particle_radius[awake] if self.polydisperse else self.particle_radius
+        self.wall_hits += reflect(pos, vel, self.box, r, self.wall_restitution, self.top_wall)
+        self.pos[awake], self.vel[awake] = pos, vel
+
+    def _handle_walls_coupled(self):
+        # Particles hitting a wall in the same step collide with the chamber
+        # together: the normal velocity of each, relative to the wall,
+        # reverses with wall_restitution, and the momentum comes out of the
+        # chamber. With k particles on one wall the chamber's share shrinks
+        # to M / (M + k m), which reduces to the two-body result for k = 1
+        # and stays stable when the payload outweighs the chamber (with
+        # mixed masses, k m is the mass of the particles hitting the wall)
+        r = self.particle_radius
+        m, M = self.particle_mass, self.mass_aga
+        e = self.wall_restitution
+        impulse = np.zeros(self.dim)
+        for axis in range(self.dim):
+            p = self.pos[:, axis]
+            v = self.vel[:, axis]
+            upper = self.box[axis] - r if axis < self.dim - 1 or self.top_wall else np.inf
+            low = p < r
+            high = p > upper
+            for outside, approaching in ((low, v < 0), (high, v > 0)):
+                hit = outside & approaching
+                k = np.count_nonzero(hit)
+                if k:
+                    carried = m[hit].sum() if self.polydisperse else k * m
+                    dv = -(1 + e) * M / (M + carried) * v[hit]
+                    v[hit] += dv
+                    # Momentum the particles received along this axis
+                    impulse[axis] += (m[hit] * dv).sum() if self.polydisperse else m * dv.sum()
+                    self.wall_hits += k
+            np.copyto(p, r, where=low)
+            np.copyto(p, upper, where=high)
+
+        # The chamber recoils; in its frame every particle moves the other way
+        recoil = -impulse / M
+        self.vel -= recoil
+        self.recoil += recoil
+        self.residual_accel = recoil / self.dt
+        self.velocity_chamber -= recoil[-1]  # velocity_chamber points down
+
+    def _handle_particle_collisions(self):
+        if self.parallel is not None:
+            checks, i_idx, j_idx = self.parallel.resolve_particle_collisions(self)
+            self.pair_checks += checks
+            self.pair_hits += len(i_idx)
+            self.contacts = i_idx, j_idx
+            return
+        # Cells as wide as the largest contact distance; pairs of two
+        # sleeping particles are left out
+        if self._awake() is None:
+            i_idx, j_idx = grid_pairs(self.pos, 2 * self.max_radius)
+        else:
+            i_idx, j_idx = active_pairs(self.pos, ~self.asleep, 2 * self.max_radius)
+        self.pair_checks += len(i_idx)
+        i_idx, j_idx = overlapping_pairs(self.pos, i_idx, j_idx,
+                                         contact_distance(self.particle_radius, i_idx, j_idx))
+        self.pair_hits += len(i_idx)
+        self.contacts = i_idx, j_idx
+        if self.polydisperse:
+            if self.collision_mode == 'batch':
+                resolve = resolve_batch_polydisperse
+            else:
+                resolve = self.kernels.resolve_sequential_polydisperse
+            resolve(self.pos, self.vel, i_idx, j_idx, self.particle_radius, self.particle_mass,
+                    self.particle_restitution)
+            return
+        resolve = resolve_batch if self.collision_mode == 'batch' else self.kernels.resolve_sequential
+        resolve(self.pos, self.vel, i_idx, j_idx, self.particle_radius, self.particle_restitution)
+
+    def _awake(self):
+        # Indices of the particles awake, or None when none is asleep
+        if self.sleep_speed is None or not self.asleep.any():
+            return None
+        return np.flatnonzero(~self.asleep)
+
+    def _update_sleep(self, accel):
+        # Runs at the end of every step once sleep_speed is set. A resting
+        # particle jitters by up to the accel * dt gravity adds each step,
+        # so speeds are measured net of that kick. Sleepers pushed past the
+        # limit by a contact wake up; the smaller velocity changes of the
+        # others are dropped, so they stay exactly in place
+        limit = self.sleep_speed + abs(accel) * self.dt
+        speed_sq = np.einsum('ij,ij->i', self.vel, self.vel)
+        calm = speed_sq < limit ** 2
+        self.calm_steps += 1
+        self.calm_steps[~calm] = 0
+        if self.asleep.any():
+            self.asleep &= calm
+            self.vel[self.asleep] = 0
+        # Only particles resting under gravity settle; in free fall a slow
+        # particle is drifting, and coupled walls move every particle
+        if accel == 0 or (self.coupled and self.is_free_fall):
+            return
+        ready = ~self.asleep & (self.calm_steps >= self.sleep_steps)
+        if not ready.any():
+            return
+        # Supported by the wall gravity pushes against: within the height
+        # a particle at the limit speed would bounce off it (the rest may
+        # be at the top of a slow hop)
+        hop = limit ** 2 / (2 * abs(accel))
+        height = self.pos[:, -1]
+        if accel > 0:
+            supported = height <= self.particle_radius + hop
+        elif self.top_wall:
+            supported = height >= self.box[-1] - self.particle_radius - hop
+        else:
+            supported = np.zeros(self.num_particles, dtype=bool)
+        if self.contacts is not None and len(self.contacts[0]):
+            # A contact cluster sleeps as a whole, not while a particle
+            # touching it still moves; resting on a sleeping or wall-
+            # supported particle counts as support, so piles fall asleep
+            # from the wall up
+            i_idx, j_idx = self.contacts
+            settled = (ready | self.asleep).astype(float)
+            restless = (np.bincount(i_idx, weights=1 - settled[j_idx], minlength=self.num_particles)
+                        + np.bincount(j_idx, weights=1 - settled[i_idx], minlength=self.num_particles))
+            base = (self.asleep | (ready & supported)).astype(float)
+            resting = (np.bincount(i_idx, weights=base[j_idx], minlength=self.num_particles)
+                       + np.bincount(j_idx, weights=base[i_idx], minlength=self.num_particles))
+            ready &= restless == 0
+            supported |= resting > 0
+        ready &= supported
+        self.asleep |= ready
+        self.vel[ready] = 0
+
+    def _time_to_contact(self, resting_speed):
+        # Earliest time at which a particle hits a wall or another particle,
+        # ignoring resting contacts that close slower than resting_speed
+        r = self.particle_radius
+        gaps = []
+        closing = []
+        for axis in range(self.dim):
+            p = self.pos[:, axis]
+            v = self.vel[:, axis]
+            gaps.append(p - r)
+            closing.append(-v)
+            if axis < self.dim - 1 or self.top_wall:
+                gaps.append(self.box[axis] - r - p)
+                closing.append(v)
+        gaps = np.concatenate(gaps)
+        closing = np.concatenate(closing)
+
+        if self.particle_restitution is not None:
+            # Pairs that can close the gap within one displacement-limited step
+            reach = 2 * self.max_radius * (1 + self.courant)
+            i_idx, j_idx = grid_pairs(self.pos, reach)
+            d, distance = pair_distance(self.pos, i_idx, j_idx)
+            separated = distance > 0
+            i_idx, j_idx = i_idx[separated], j_idx[separated]
+            d, distance = d[separated], distance[separated]
+            w = self.vel[i_idx] - self.vel[j_idx]
+            approach = w[:, 0] * d[:, 0]
+            for axis in range(1, self.dim):
+                approach = approach + w[:, axis] * d[:, axis]
+            gaps = np.concatenate([gaps, distance - contact_distance(r, i_idx, j_idx)])
+            closing = np.concatenate([closing, -approach / distance])
+
+        impact = (closing > resting_speed) & (gaps > 0)
+        if not impact.any():
+            return np.inf
+        return float((gaps[impact] / closing[impact]).min())
+
+    def _choose_dt(self, until):
+        # Upper bound on the downward acceleration during the next step; the
+        # drag on a free-falling chamber only grows, so its value one
+        # max_dt ahead bounds it
+        if self.gravity_model == 'switch_off' and self.is_free_fall:
+            accel = 0.0
+        elif self.gravity_model == 'drag' and self.is_free_fall and not self.coupled:
+            since = self.time - self.free_fall_started_at
+            accel = abs(float(self.chamber.at(since + self.max_dt)[0]))
+        else:
+            accel = abs(self.gravity)
+        dt = self.max_dt
+
+        # Displacement limit: with particle collisions on, no particle moves
+        # more than `courant` radii per step, so pairs cannot pass through
+        # each other between two checks. Without them nothing can tunnel, and
+        # only the sag of a path under gravity and the next impact bound the
+        # step, so quiet phases take long steps
+        reach = self.courant * float(np.min(self.particle_radius))
+        if self.particle_restitution is not None:
+            speed = float(np.sqrt((self.vel**2).sum(axis=1)).max(initial=0.0))
+            if accel > 0:
+                dt = min(dt, (np.sqrt(speed * speed + 2 * accel * reach) - speed) / accel)
+            elif speed > 0:
+                dt = min(dt, reach / speed)
+        elif accel > 0:
+            dt = min(dt, np.sqrt(2 * GRAVITY_SAG * reach / accel))
+
+        # End the step at the next impact; contacts closing no faster than
+        # gravity alone makes them within the step (particles resting on
+        # the floor or on each other) do not count
+        dt = min(dt, max(self._time_to_contact(2 * accel * dt), self.min_dt))
+        dt = max(dt, self.min_dt)
+
+        # Land exactly on the gravity switch and on the end of the run
+        for boundary in (self.start_time, until):
+            if boundary is not None and 0 < boundary - self.time < dt:
+                return boundary - self.time, boundary
+        return dt, None
+
+    def _advance_one(self, sink=None, until=None):
+        if self.instruments is not None:
+            self.instruments.begin_step(self)
+        landing = None
+        if self.adaptive:
+            self.dt, landing = self._choose_dt(until)
+
+        # Switch to free fall once start_time is reached
+        if self.time >= self.start_time and not self.is_free_fall:
+            self.is_free_fall = True
+            self.free_fall_started_at = self.time
+
+        # Update velocities, then positions; sleeping particles stay put
+        # unless the gravity schedule changed
+        accel = self._gravity_step()
+        if self.sleep_speed is not None and accel != self.last_accel:
+            # Woken particles count their calm steps afresh, or they would
+            # fall back asleep at the end of this very step
+            self.asleep[:] = False
+            self.calm_steps[:] = 0
+        self.last_accel = accel
+        awake = self._awake()
+        if self.parallel is not None:
+            self.parallel.advance(self, accel)
+        elif awake is None:
+            self.kernels.advance(self.pos, self.vel, accel, self.dt)
+        else:
+            pos, vel = self.pos[awake], self.vel[awake]
+            self.kernels.advance(pos, vel, accel, self.dt)
+            self.pos[awake], self.vel[awake] = pos, vel
+
+        if self.instruments is not None:
+            self.instruments.before_contacts(self)
+        self._handle_walls()
+        self.contacts = None
+        if self.particle_restitution is not None:
+            self._handle_particle_collisions()
+        if self.sleep_speed is not None:
+            self._update_sleep(accel)
+
+        self.time = self.time + self.dt if landing is None else landing
+        self.steps += 1
+        if self.instruments is not None:
+            self.instruments.end_step(self)
+        if sink is not None:
+            sink.append(self.time, self.pos, self.vel)
+
+    def step(self, n=1, sink=None):
+        """Advance the simulation by ``n`` time steps.
+
+        ``sink`` (e.g. a frames-mode ``trajectory.TrajectoryWriter``) receives
+        ``append(time, pos, vel)`` after every step.
+        """
+        for _ in range(n):
+            self._advance_one(sink)
+
+    def run(self, until=None, sink=None, checkpoint=None):
+        """Step until the simulation time reaches ``until`` (default ``simulation_time``).
+
+        ``checkpoint`` (a ``checkpoint.Checkpointer``) gets to save the
+        state after every step.
+        """
+        if until is None:
+            until = self.simulation_time
+        while self.time < until:
+            self._advance_one(sink, until)
+            if checkpoint is not None:
+                checkpoint.after_step(self)
+
+    def status_message(self):
+        return (
+            f"Time: {self.time:.2f} s\n"
+            f"Effective Gravity (g_eff): {self.g_eff:.2f} cm/s²\n"
+            f"Free Fall: {'Active' if self.is_free_fall else 'Waiting'}"
+        )
@@ -0,0 +1,152 @@
+"""Parameter sweeps over the prototype parameter space.
+
+Each point of a grid or random sample runs as a headless ``Simulation`` in
+a process pool, with its own independent RNG stream, and the summary
+metrics of all runs are collected into one columnar ``.npz`` file::
+
+    python sweep.py --preset protoypr03 --grid wall_restitution=0.6,0.8,1.0 \\
+        --grid drag_coefficient=0.3,0.5 --until 20 --out sweep.npz
+
+    python sweep.py --preset prototype05 --sample particle_restitution=0.1:0.9 \\
+        --samples 200 --seed 1 --out sweep.npz
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import PRESETS, Simulation
+
+# Constants the prototypes differ in, and which a sweep may vary
+SWEEP_PARAMETERS = ('wall_restitution', 'particle_restitution', 'dt', 'start_time',
+                    'drag_coefficient', 'air_density', 'mass_aga', 'frontal_area')
+
+METRICS = ('residual_g', 'residual_g_max', 'kinetic_energy', 'kinetic_energy_final',
+           'wall_hit_rate', 'steps')
+
+
+def grid(**values):
+    """Every combination of the given parameter values, as a list of dicts."""
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(values[n] for n in names))]
+
+
+def random_sample(num_samples, seed=None, **ranges):
+    """``num_samples`` parameter dicts drawn uniformly from ``name=(low, high)`` ranges."""
+    rng = np.random.default_rng(seed)
+    columns = {name: rng.uniform(low, high, num_samples) for name, (low, high) in ranges.items()}
+    return [{name: float(columns[name][k]) for name in ranges} for k in range(num_samples)]
+
+
+def run_point(preset, params, seed, until):
+    """Run one headless simulation and return its summary metrics."""
+    sim = Simulation.from_preset(preset, **params, seed=seed)
+    if until is None:
+        until = sim.simulation_time
+    residual_sum = 0.0
+    residual_max = 0.0
+    energy_sum = 0.0
+    free_fall_steps = 0
+    free_fall_hits = 0
+    while sim.time < until:
+        before = sim.vel.copy()
+        hits = sim.wall_hits
+        sim.step()
+        if not sim.is_free_fall:
+            continue
+        # Residual acceleration felt by the particles in the chamber frame
+        accel = np.sqrt(((sim.vel - before)**2).sum(axis=1)) / sim.dt
+        residual_sum += accel.mean()
+        residual_max = max(residual_max, float(accel.max(initial=0.0)))
+        energy_sum += sim.kinetic_energy()
+        free_fall_hits += sim.wall_hits - hits
+        free_fall_steps += 1
+    free_fall_time = free_fall_steps * sim.dt
+    return {
+        'residual_g': residual_sum / free_fall_steps if free_fall_steps else np.nan,
+        'residual_g_max': residual_max,
+        'kinetic_energy': energy_sum / free_fall_steps if free_fall_steps else np.nan,
+        'kinetic_energy_final': sim.kinetic_energy(),
+        'wall_hit_rate': free_fall_hits / (sim.num_particles * free_fall_time) if free_fall_steps else np.nan,
+        'steps': sim.steps,
+    }
+
+
+def _run_point(args):
+    return run_point(*args)
+
+
+def run_sweep(param_sets, preset='prototype05', until=None, seed=None, workers=None):
+    """Run every parameter dict in ``param_sets`` and return the results as columns.
+
+    Every run gets its own ``SeedSequence`` child of ``seed``, so results do
+    not depend on the number of workers or the order runs finish in.
+    ``workers`` defaults to every core on the machine.
+    """
+    if preset not in PRESETS:
+        raise KeyError(f"unknown preset {preset!r}, expected one of {sorted(PRESETS)}")
+    for params in param_sets:
+        unknown = set(params) - set(SWEEP_PARAMETERS)
+        if unknown:
+            raise ValueError(f"cannot sweep {sorted(unknown)}, expected some of {SWEEP_PARAMETERS}")
+    seeds = np.random.SeedSequence(seed).spawn(len(param_sets))
+    jobs = [(preset, params, child, until) for params, child in zip(param_sets, seeds)]
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run_point, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+    # One column per swept parameter and per metric
+    names = sorted({name for params in param_sets for name in params})
+    columns = {name: np.array([params.get(name, np.nan) for params in param_sets], dtype=float)
+               for name in names}
+    # Run k used SeedSequence(entropy=root_entropy, spawn_key=(k,))
+    columns['run'] = np.arange(len(param_sets))
+    columns['root_entropy'] = np.array(str(seeds[0].entropy) if seeds else '')
+    for metric in METRICS:
+        columns[metric] = np.array([result[metric] for result in results])
+    return columns
+
+
+def save_results(columns, path):
+    np.savez(path, **columns)
+
+
+def _parse_values(text):
+    name, _, values = text.partition('=')
+    if name not in SWEEP_PARAMETERS:
+        raise argparse.ArgumentTypeError(f"cannot sweep {name!r}, expected one of {SWEEP_PARAMETERS}")
+    return name, values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--preset', default='prototype05', choices=sorted(PRESETS))
+    parser.add_argument('--grid', action='append', default=[], type=_parse_values,
+                        metavar='NAME=V1,V2,...', help='values of one parameter for a full grid')
+    parser.add_argument('--sample', action='append', default=[], type=_parse_values,
+                        metavar='NAME=LOW:HIGH', help='range of one parameter for random sampling')
+    parser.add_argument('--samples', type=int, default=100, help='number of random samples')
+    parser.add_argument('--until', type=float, default=None, help='simulation end time (s)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default='sweep.npz')
+    args = parser.parse_args(argv)
+
+    if args.grid and args.sample:
+        parser.error('use either --grid or --sample')
+    if args.sample:
+        ranges = {name: tuple(float(v) for v in values.split(':')) for name, values in args.sample}
+        param_sets = random_sample(args.samples, seed=args.seed, **ranges)
+    else:
+        param_sets = grid(**{name: [float(v) for v in values.split(',')] for name, values in args.grid})
+
+    columns = run_sweep(param_sets, preset=args.preset, until=args.until, seed=args.seed,
+                        workers=args.workers)
+    save_results(columns, args.out)
+    print(f"{len(param_sets)} runs written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+from simulation import Simulation
+
+
+def test_adaptive_takes_fewer_steps_than_fixed_dt_without_particle_collisions():
+    fixed = Simulation.from_preset('protoypr03', seed=0)
+    fixed.run()
+    adaptive = Simulation.from_preset('protoypr03', adaptive=True, seed=0)
+    adaptive.run()
+    assert adaptive.time == fixed.simulation_time
+    assert adaptive.steps < fixed.steps
+
+
+def test_adaptive_lands_on_the_gravity_switch():
+    sim = Simulation.from_preset('prototype04', adaptive=True, seed=0)
+    while not sim.is_free_fall:
+        sim.step()
+    assert sim.free_fall_started_at == sim.start_time
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from kernels import get_backend
+from simulation import Simulation
+
+pytest.importorskip('numba')
+
+RADIUS = np.random.default_rng(0).uniform(0.5, 1.2, 100)
+CASES = {
+    'sequential': ('prototype05', {}),
+    'batch': ('prototype05', {'collision_mode': 'batch'}),
+    'adaptive': ('prototype05', {'adaptive': True}),
+    'drag': ('protoypr03', {}),
+    '3-d': ('microgravity_cube', {}),
+    'mixed': ('prototype05', {'num_particles': 100, 'particle_radius': RADIUS,
+                              'particle_mass': 100 * (RADIUS / 0.9)**3, 'spawn_height': (10.0, 23.8)}),
+}
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_backends_are_bit_identical(case, dtype):
+    name, overrides = CASES[case]
+    runs = []
+    for backend in ('numpy', 'numba'):
+        sim = Simulation.from_preset(name, backend=backend, dtype=dtype, seed=1, **overrides)
+        sim.run(2.0)
+        assert sim.kernels is get_backend(backend)
+        runs.append(sim)
+    numpy_run, numba_run = runs
+    assert numpy_run.pos.dtype == np.dtype(dtype)
+    assert np.array_equal(numpy_run.pos, numba_run.pos)
+    assert np.array_equal(numpy_run.vel, numba_run.vel)
+    assert numpy_run.kinetic_energy() == numba_run.kinetic_energy()
@@ -0,0 +1,27 @@
+import pytest
+
+from simulation import Simulation
+
+# The threshold the README and the Simulation docstring recommend
+SLEEP_SPEED = 5.0
+
+
+@pytest.mark.parametrize('dt', [0.002, 0.01, 0.02])
+def test_settled_bed_sleeps_at_the_documented_threshold(dt):
+    # At dt = 0.02 gravity adds 19.6 cm/s per step, far above the threshold
+    sim = Simulation.from_preset('prototype05', num_particles=40, tube_width=30.0, tube_height=30.0,
+                                 dt=dt, start_time=3.0, simulation_time=3.5, sleep_speed=SLEEP_SPEED,
+                                 seed=0)
+    sim.run(2.9)
+    assert sim.asleep.all()
+    assert not sim.vel.any()
+
+
+def test_free_fall_switch_wakes_the_bed():
+    sim = Simulation.from_preset('prototype05', num_particles=40, tube_width=30.0, tube_height=30.0,
+                                 start_time=3.0, simulation_time=3.5, sleep_speed=SLEEP_SPEED, seed=0)
+    sim.run(2.9)
+    asleep = sim.asleep.copy()
+    sim.run()
+    assert asleep.all()
+    assert not sim.asleep.any()
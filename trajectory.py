@@ -0,0 +1,210 @@
+import bisect
+import struct
+
+import numpy as np
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def frame_dtype(num_particles, dim=2, dtype=np.float64):
+    """Record layout of one full frame: time plus every particle's position and velocity."""
+    return np.dtype([('time', np.float64),
+                     ('pos', dtype, (num_particles, dim)),
+                     ('vel', dtype, (num_particles, dim))])
+
+
+def delta_dtype(dim=3, dtype=np.float64):
+    """Record layout of one particle update: time, particle index, position and velocity."""
+    return np.dtype([('time', np.float64),
+                     ('index', np.int64),
+                     ('pos', dtype, (dim,)),
+                     ('vel', dtype, (dim,))])
+
+
+class TrajectoryWriter:
+    """Stream simulation states to an append-only ``.npy`` file.
+
+    The file is a one-dimensional ``.npy`` array of fixed-size records, so it
+    can be opened with ``np.load(path, mmap_mode='r')``. Records are buffered
+    in chunks of ``chunk_size`` and appended to the file; the header's record
+    count is rewritten after every chunk, so everything up to the last
+    flushed chunk survives a crash.
+
+    ``mode='frames'`` stores the whole particle state, keeping one frame in
+    every ``every`` calls to ``append`` (time-stepped runs). ``mode='deltas'``
+    stores one record per changed particle via ``append_changes``, which is
+    lossless and compact for event-driven runs where only one or two
+    particles change per event.
+    """
+
+    def __init__(self, path, num_particles, dim=2, mode='frames', every=1, chunk_size=256,
+                 dtype=np.float64):
+        if mode not in ('frames', 'deltas'):
+            raise ValueError(f"unknown mode {mode!r}, expected 'frames' or 'deltas'")
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        self.path = path
+        self.num_particles = num_particles
+        self.dim = dim
+        self.mode = mode
+        self.every = every
+        if mode == 'frames':
+            self.dtype = frame_dtype(num_particles, dim, dtype)
+        else:
+            self.dtype = delta_dtype(dim, dtype)
+        self.count = 0
+        self._calls = 0
+        self._buffer = np.zeros(chunk_size, dtype=self.dtype)
+        self._buffered = 0
+
+        # Header with room for the largest record count, rewritten on flush
+        descr = np.lib.format.dtype_to_descr(self.dtype)
+        self._header_dict = "{'descr': %r, 'fortran_order': False, 'shape': (%%d,), }" % (descr,)
+        longest = len(NPY_MAGIC) + 2 + len(self._header_dict % (2**63 - 1)) + 1
+        self._header_size = -(-longest // 64) * 64
+        self._file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        text = self._header_dict % self.count
+        text += ' ' * (self._header_size - len(NPY_MAGIC) - 2 - len(text) - 1) + '\n'
+        self._file.seek(0)
+        self._file.write(NPY_MAGIC + struct.pack('<H', len(text)) + text.encode('latin1'))
+        self._file.seek(0, 2)
+
+    def _reserve(self, n):
+        # Make room for n more records in the buffer, flushing it if needed
+        if self._buffered + n > len(self._buffer):
+            self.flush()
+            if n > len(self._buffer):
+                self._buffer = np.zeros(n, dtype=self.dtype)
+        start = self._buffered
+        self._buffered += n
+        return self._buffer[start:self._buffered]
+
+    def append(self, time, pos, vel):
+        """Add a full frame (frames mode); only every ``every``-th call is kept."""
+        if self.mode != 'frames':
+            raise ValueError("append() needs mode='frames', use append_changes() for deltas")
+        self._calls += 1
+        if (self._calls - 1) % self.every:
+            return
+        record = self._reserve(1)
+        record['time'] = time
+        record['pos'] = pos
+        record['vel'] = vel
+
+    def append_changes(self, time, indices, pos, vel):
+        """Add the new state of the particles ``indices`` (deltas mode)."""
+        if self.mode != 'deltas':
+            raise ValueError("append_changes() needs mode='deltas', use append() for frames")
+        indices = np.atleast_1d(indices)
+        records = self._reserve(len(indices))
+        records['time'] = time
+        records['index'] = indices
+        records['pos'] = pos
+        records['vel'] = vel
+
+    def flush(self):
+        if self._buffered:
+            self._file.write(self._buffer[:self._buffered].tobytes())
+            self.count += self._buffered
+            self._buffered = 0
+            self._write_header()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """Random access to a file written by ``TrajectoryWriter``.
+
+    The records are opened with ``np.load(mmap_mode='r')``, so opening is
+    instant whatever the file size and only the pages that are actually
+    touched are read. The memory-mapped time column serves as the
+    time->record index: it is sorted, and lookups bisect it, reading
+    O(log n) records.
+
+    Frames files return zero-copy views: a time window is a slice of the
+    records, and a particle subset given as a ``slice`` stays a view (an
+    index array makes NumPy copy the selected particles). Deltas files are
+    reconstructed with ``state_at``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = np.load(path, mmap_mode='r')
+        self.mode = 'deltas' if 'index' in self.records.dtype.names else 'frames'
+        self.times = self.records['time']
+        self.dim = self.records.dtype['pos'].shape[-1]
+        if self.mode == 'frames':
+            self.num_particles = self.records.dtype['pos'].shape[0]
+        self._replay = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def index_at(self, t):
+        """Index of the last record at or before time ``t`` (-1 if there is none)."""
+        return bisect.bisect_right(self.times, t) - 1
+
+    def window(self, t_start, t_end):
+        """Slice of the records with ``t_start <= time <= t_end``."""
+        return slice(bisect.bisect_left(self.times, t_start), bisect.bisect_right(self.times, t_end))
+
+    def _frames(self, field, t_start, t_end, particles):
+        if self.mode != 'frames':
+            raise ValueError("positions/velocities need a frames file, use state_at() for deltas")
+        if t_end is None:
+            t_end = t_start
+        frames = self.records[field][self.window(t_start, t_end)]
+        return frames if particles is None else frames[:, particles]
+
+    def positions(self, t_start, t_end=None, particles=None):
+        """Positions of the frames in ``[t_start, t_end]``, shape (frames, particles, dim)."""
+        return self._frames('pos', t_start, t_end, particles)
+
+    def velocities(self, t_start, t_end=None, particles=None):
+        """Velocities of the frames in ``[t_start, t_end]``, shape (frames, particles, dim)."""
+        return self._frames('vel', t_start, t_end, particles)
+
+    def frame_at(self, t):
+        """The last full frame at or before ``t`` as a (time, pos, vel) tuple of views."""
+        k = max(self.index_at(t), 0)
+        return self.times[k], self.records['pos'][k], self.records['vel'][k]
+
+    def state_at(self, t, num_particles=None):
+        """Positions and velocities of every particle at time ``t`` from a deltas file.
+
+        Each particle's last record at or before ``t`` is extrapolated
+        ballistically to ``t``; the file should start with a keyframe
+        (``EventDrivenSimulation.record_state``). Replay is incremental: moving forward in time
+        only scans the records added since the previous call.
+        """
+        if self.mode != 'deltas':
+            raise ValueError("state_at() needs a deltas file, use frame_at() for frames")
+        end = self.index_at(t) + 1
+        if self._replay is None or self._replay[0] > end:
+            if num_particles is None:
+                # The keyframe written at the start holds every particle
+                keyframe = self.records['index'][:bisect.bisect_right(self.times, self.times[0])]
+                num_particles = int(keyframe.max()) + 1
+            self._replay = (0, np.zeros(num_particles), np.zeros((num_particles, self.dim)),
+                            np.zeros((num_particles, self.dim)))
+        start, t_last, pos, vel = self._replay
+        chunk = self.records[start:end]
+        # Later records overwrite earlier ones, so the last one per particle wins
+        pos[chunk['index']] = chunk['pos']
+        vel[chunk['index']] = chunk['vel']
+        t_last[chunk['index']] = chunk['time']
+        self._replay = (end, t_last, pos, vel)
+        return pos + vel * (t - t_last)[:, None], vel.copy()